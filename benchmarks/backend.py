@@ -0,0 +1,134 @@
+"""End-to-end benchmark of InternetArchiveBackend against a fake server.
+
+Run with ``python -m benchmarks.backend``.
+
+"""
+
+import argparse
+import collections
+import configparser
+import time
+
+from mopidy_internetarchive import Extension
+from mopidy_internetarchive.backend import InternetArchiveBackend
+
+from . import fixtures
+from .fakeserver import FakeArchive
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+def make_config(**overrides):
+    ext = Extension()
+    parser = configparser.RawConfigParser()
+    parser.read_string(ext.get_default_config())
+    values, errors = ext.get_config_schema().deserialize(
+        dict(parser.items(ext.ext_name))
+    )
+    assert not errors, errors
+    values.update(overrides)
+    return {ext.ext_name: values, "proxy": {}}
+
+
+class Timer:
+    def __init__(self):
+        self.timings = collections.defaultdict(list)
+
+    def __call__(self, name, future):
+        start = time.perf_counter()
+        result = future.get()
+        self.timings[name].append(time.perf_counter() - start)
+        return result
+
+    def report(self, title):
+        print(title)
+        print(
+            "  %-14s %6s %9s %9s %9s %9s"
+            % ("operation", "count", "p50", "p90", "p99", "max")
+        )
+        for name, values in self.timings.items():
+            print(
+                "  %-14s %6d %8.1fms %8.1fms %8.1fms %8.1fms"
+                % (
+                    name,
+                    len(values),
+                    percentile(values, 50) * 1000,
+                    percentile(values, 90) * 1000,
+                    percentile(values, 99) * 1000,
+                    max(values) * 1000,
+                )
+            )
+
+
+def run(backend, timer, items):
+    library, playback = backend.library, backend.playback
+    for root in timer("browse", library.browse("internetarchive:")):
+        views = timer("browse", library.browse(root.uri))
+        refs = timer("browse", library.browse(views[0].uri))[:items]
+        for ref in refs:
+            tracks = timer("browse", library.browse(ref.uri))
+            timer("lookup", library.lookup(ref.uri))
+            for track in tracks[:3]:
+                timer("lookup", library.lookup(track.uri))
+                timer("translate_uri", playback.translate_uri(track.uri))
+        timer("get_images", library.get_images([ref.uri for ref in refs]))
+    timer("search", library.search({"any": ["live"]}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", "--fixtures", metavar="DIR")
+    parser.add_argument("-i", "--items", type=int, default=10)
+    parser.add_argument("-t", "--tracks", type=int, default=20)
+    parser.add_argument("-T", "--large", type=int, default=1000)
+    parser.add_argument("-L", "--latency", type=float, default=0.02)
+    parser.add_argument("-r", "--rounds", type=int, default=5)
+    parser.add_argument("-c", "--cache-size", type=int, default=128)
+    parser.add_argument("-w", "--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.fixtures:
+        items, results = fixtures.load(args.fixtures)
+        names = [name for name in results if name in items]
+    else:
+        names = ["etree", "audio"]
+        items, results = fixtures.archive(
+            names, items=args.items, tracks=args.tracks, large=args.large
+        )
+    config = make_config(
+        collections=names,
+        audio_formats=["VBR MP3", "64Kbps MP3"],
+        browse_limit=args.items + 1,
+        cache_size=args.cache_size,
+        workers=args.workers,
+        metrics=True,
+    )
+    server = FakeArchive(items, results, latency=args.latency)
+    with server:
+        config[Extension.ext_name]["base_url"] = server.base_url
+        actor = InternetArchiveBackend.start(config, None)
+        backend = actor.proxy()
+        try:
+            cold, warm = Timer(), Timer()
+            run(backend, cold, args.items + 1)
+            requests = dict(server.requests)
+            for _ in range(args.rounds):
+                run(backend, warm, args.items + 1)
+            stats = backend.stats().get()
+        finally:
+            actor.stop()
+    cold.report("cold cache (requests: %s)" % requests)
+    warm.report("warm cache, %d rounds" % args.rounds)
+    print("server requests: %s" % dict(server.requests))
+    for name, values in stats.items():
+        print("%s: %s" % (name, values))
+    if stats["cache"]:
+        hits, misses = stats["cache"]["hits"], stats["cache"]["misses"]
+        print("cache hit ratio: %.1f%%" % (100.0 * hits / (hits + misses)))
+
+
+if __name__ == "__main__":
+    main()
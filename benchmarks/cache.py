@@ -0,0 +1,70 @@
+"""Benchmark memory use and access time of item caches.
+
+Run with ``python -m benchmarks.cache``.
+
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+from mopidy_internetarchive.cache import Cache, CompressedCache
+from mopidy_internetarchive.client import _decode, _dumps
+
+from . import fixtures
+
+
+def measure(name, cache, items, rounds):
+    tracemalloc.start()
+    for identifier, content in items.items():
+        cache.get_or_compute(identifier, _decode, content)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for identifier in items:
+            cache.get_or_compute(identifier, _decode, None)
+    elapsed = time.perf_counter() - start
+    print(
+        "%-12s %8.1fMB %8.1fKB/item %8.3fms/hit"
+        % (
+            name,
+            size / 2**20,
+            size / len(items) / 2**10,
+            elapsed / rounds / len(items) * 1000,
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", "--fixtures", metavar="DIR")
+    parser.add_argument("-i", "--items", type=int, default=200)
+    parser.add_argument("-t", "--tracks", type=int, default=20)
+    parser.add_argument("-r", "--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.fixtures:
+        objs, _ = fixtures.load(args.fixtures)
+    else:
+        objs, _ = fixtures.archive(
+            ["etree"], items=args.items, tracks=args.tracks, large=0
+        )
+    # cache responses as decoded by the client
+    items = {k: json.dumps(v).encode("utf-8") for k, v in objs.items()}
+    print(
+        "%d items, %d bytes of JSON"
+        % (len(items), sum(map(len, items.values())))
+    )
+    measure("plain", Cache(len(items)), items, args.rounds)
+    measure(
+        "compressed",
+        CompressedCache(len(items), encode=_dumps, decode=_decode),
+        items,
+        args.rounds,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Benchmark decoding and transferring large item metadata.
+
+Run with ``python -m benchmarks.decode``.
+
+"""
+
+import argparse
+import gzip
+import json
+import timeit
+import zlib
+
+from mopidy_internetarchive import client
+
+from . import fixtures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", "--fixtures", metavar="DIR")
+    parser.add_argument("-T", "--tracks", type=int, nargs="+")
+    parser.add_argument("-n", "--number", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.fixtures:
+        items, _ = fixtures.load(args.fixtures)
+    else:
+        items = {
+            f"item{n}": fixtures.item(f"item{n}", tracks=n)
+            for n in args.tracks or [20, 200, 2000]
+        }
+    decoders = {"json": json.loads}
+    try:
+        import orjson
+    except ImportError:
+        print("orjson not installed")
+    else:
+        decoders["orjson"] = orjson.loads
+    print(
+        "%-24s %9s %9s %9s %s"
+        % (
+            "item",
+            "bytes",
+            "gzip",
+            "deflate",
+            " ".join("%9s" % name for name in decoders),
+        )
+    )
+    for identifier, obj in items.items():
+        content = json.dumps(obj).encode("utf-8")
+        timings = [
+            timeit.timeit(lambda: loads(content), number=args.number)
+            / args.number
+            for loads in decoders.values()
+        ]
+        print(
+            "%-24s %9d %9d %9d %s"
+            % (
+                identifier[:24],
+                len(content),
+                len(gzip.compress(content, compresslevel=6)),
+                len(zlib.compress(content, 6)),
+                " ".join("%7.2fms" % (t * 1000) for t in timings),
+            )
+        )
+    print("client decoder: %s" % client._loads.__module__)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import gzip
+import http.server
+import json
+import re
+import threading
+import time
+import urllib.parse
+from collections import Counter
+
+COLLECTION_RE = re.compile(r"collection:(?:\(([^)]*)\)|(\S+))")
+
+IDENTIFIER_RE = re.compile(r"identifier:\(([^)]*)\)")
+
+
+class FakeArchive(http.server.ThreadingHTTPServer):
+    """Local stand-in for the archive.org metadata and search APIs.
+
+    `items` maps identifiers to metadata API responses, `collections`
+    maps collection identifiers to lists of search result documents.
+    Each request is delayed by `latency` seconds; searches are
+    additionally delayed by `scan_latency` seconds per document in the
+    collections searched, to model the cost of large collections.
+    Responses are gzip-compressed if `compress` is set and the client
+    accepts it.
+
+    """
+
+    daemon_threads = True
+
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        items=None,
+        collections=None,
+        latency=0.0,
+        scan_latency=0.0,
+        compress=True,
+        address=("127.0.0.1", 0),
+    ):
+        super().__init__(address, _Handler)
+        self.items = items or {}
+        self.collections = collections or {}
+        self.latency = latency
+        self.scan_latency = scan_latency
+        self.compress = compress
+        self.requests = Counter()
+        self.__lock = threading.Lock()
+        self.__thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self.__thread = threading.Thread(
+            target=self.serve_forever, kwargs={"poll_interval": 0.01}
+        )
+        self.__thread.daemon = True
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.__thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def count(self, name, value=1):
+        with self.__lock:
+            self.requests[name] += value
+
+    def metadata(self, identifier):
+        time.sleep(self.latency)
+        return self.items.get(identifier, {})
+
+    def search(self, query, fields=None, sort=None, rows=None, start=0):
+        docs = []
+        for match in COLLECTION_RE.finditer(query):
+            for name in (match.group(1) or match.group(2)).split(" OR "):
+                docs.extend(self.collections.get(name, []))
+        for match in IDENTIFIER_RE.finditer(query):
+            names = match.group(1).split(" OR ")
+            docs.extend(
+                dict(self.items[name]["metadata"], identifier=name)
+                for name in names
+                if name in self.items
+            )
+        time.sleep(self.latency + self.scan_latency * len(docs))
+        # without explicit sort order, use downloads in place of relevance
+        for order in reversed(sort or ["downloads desc"]):
+            field, _, direction = order.partition(" ")
+            docs.sort(
+                key=lambda doc: doc.get(field) or 0,
+                reverse=(direction == "desc"),
+            )
+        if rows is not None:
+            docs = docs[start : start + rows]
+        if fields:
+            docs = [{k: v for k, v in d.items() if k in fields} for d in docs]
+        return {
+            "responseHeader": {"params": {"query": query}},
+            "response": {"numFound": len(docs), "start": start, "docs": docs},
+        }
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.count("connections")
+
+    def do_HEAD(self):  # noqa: N802
+        self.server.count("head")
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):  # noqa: N802
+        url = urllib.parse.urlsplit(self.path)
+        params = urllib.parse.parse_qs(url.query)
+        if url.path.startswith("/metadata/"):
+            self.server.count("metadata")
+            obj = self.server.metadata(url.path[len("/metadata/") :])
+        elif url.path == "/advancedsearch.php":
+            self.server.count("search")
+            obj = self.server.search(
+                params.get("q", [""])[0],
+                fields=params.get("fl[]"),
+                sort=params.get("sort[]"),
+                rows=int(params["rows"][0]) if "rows" in params else None,
+                start=int(params.get("start", ["0"])[0]),
+            )
+        else:
+            self.send_error(404)
+            return
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if self.server.compress and "gzip" in self.headers.get(
+            "Accept-Encoding", ""
+        ):
+            body = gzip.compress(body, compresslevel=6)
+            self.send_header("Content-Encoding", "gzip")
+        self.server.count("bytes", len(body))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
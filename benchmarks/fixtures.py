@@ -0,0 +1,171 @@
+"""Synthetic and recorded archive.org API responses for benchmarking.
+
+Recorded fixtures are read from a directory containing
+``metadata/<identifier>.json`` files with `/metadata` API responses,
+and ``search/<collection>.json`` files with lists of search result
+documents, as written by ``python -m benchmarks.record``.
+
+"""
+
+import json
+import pathlib
+import random
+
+AUDIO_FORMATS = [
+    ("Flac", ".flac", None),
+    ("VBR MP3", ".mp3", "197.54"),
+    ("64Kbps MP3", "_64kb.mp3", "64"),
+    ("Ogg Vorbis", ".ogg", "176.84"),
+]
+
+OTHER_FILES = [
+    ("{}.jpg", "JPEG"),
+    ("{}_thumb.jpg", "JPEG Thumb"),
+    ("{}_files.xml", "Metadata"),
+    ("{}_meta.xml", "Metadata"),
+    ("{}.ffp", "Flac FingerPrint"),
+    ("{}.md5", "Checksums"),
+    ("{}.txt", "Text"),
+]
+
+
+def item(identifier, tracks=20, mediatype="etree", collection="etree", seed=0):
+    """Return a `/metadata` response modelled on Live Music Archive items.
+
+    Each track is present as an original FLAC file and derived in
+    several lossy formats, along with images and other files.
+
+    """
+    rng = random.Random(f"{identifier}:{seed}")
+    creator = "Band #%d" % rng.randrange(1000)
+    files = []
+    for n in range(1, tracks + 1):
+        name = f"{identifier}d{n // 20 + 1}t{n:02d}"
+        title = "Song #%d" % rng.randrange(10000)
+        seconds = rng.randrange(60, 1200)
+        length = "%d:%02d" % divmod(seconds, 60)
+        original = name + AUDIO_FORMATS[0][1]
+        for fmt, ext, bitrate in AUDIO_FORMATS:
+            obj = {
+                "name": name + ext,
+                "format": fmt,
+                "size": str(rng.randrange(10**6, 10**8)),
+                "mtime": str(rng.randrange(10**9, 2 * 10**9)),
+                "md5": "%032x" % rng.getrandbits(128),
+                "crc32": "%08x" % rng.getrandbits(32),
+                "sha1": "%040x" % rng.getrandbits(160),
+                "length": length if ext != ".flac" else str(seconds),
+            }
+            if ext == ".flac":
+                obj.update(
+                    source="original",
+                    title=title,
+                    track=str(n),
+                    creator=creator,
+                    album=identifier,
+                )
+            else:
+                obj.update(source="derivative", original=original)
+                obj.update(bitrate=bitrate)
+            files.append(obj)
+    for pattern, fmt in OTHER_FILES:
+        files.append(
+            {
+                "name": pattern.format(identifier),
+                "format": fmt,
+                "source": "original" if fmt != "Metadata" else "metadata",
+                "size": str(rng.randrange(10**3, 10**6)),
+            }
+        )
+    rng.shuffle(files)
+    return {
+        "created": rng.randrange(10**9, 2 * 10**9),
+        "dir": f"/1/items/{identifier}",
+        "files": files,
+        "files_count": len(files),
+        "item_size": sum(int(f["size"]) for f in files),
+        "metadata": {
+            "identifier": identifier,
+            "title": f"{creator} Live at Venue #{rng.randrange(100)}",
+            "creator": creator,
+            "mediatype": mediatype,
+            "collection": [collection, "etree"],
+            "date": "19%02d-%02d-%02d"
+            % (
+                rng.randrange(60, 100),
+                rng.randrange(1, 13),
+                rng.randrange(1, 29),
+            ),
+            "description": "Set 1: "
+            + ", ".join(
+                "Song #%d" % rng.randrange(10000) for _ in range(tracks)
+            ),
+            "publicdate": "2005-01-01 00:00:00",
+            "addeddate": "2005-01-01 00:00:00",
+            "source": "SBD > DAT > CD",
+        },
+        "server": "ia800000.us.archive.org",
+        "workable_servers": ["ia800000.us.archive.org"],
+        "uniq": rng.randrange(10**9),
+    }
+
+
+def collection(identifier, title=None):
+    """Return a `/metadata` response for a collection."""
+    return {
+        "files": [],
+        "metadata": {
+            "identifier": identifier,
+            "title": title or identifier,
+            "mediatype": "collection",
+        },
+    }
+
+
+def docs(items):
+    """Return search result documents for `/metadata` responses."""
+    rng = random.Random(len(items))
+    return [
+        dict(
+            obj["metadata"],
+            downloads=rng.randrange(100000),
+            format=sorted({f["format"] for f in obj["files"]}),
+        )
+        for obj in items
+    ]
+
+
+def archive(collections=("etree", "audio"), items=10, tracks=20, large=500):
+    """Return `items` and `collections` mappings for a fake archive.
+
+    Each collection gets `items` items of `tracks` tracks, and one
+    very large item of `large` tracks.
+
+    """
+    metadata = {}
+    results = {}
+    for name in collections:
+        objs = [
+            item(f"{name}{n:04d}", tracks=tracks, collection=name)
+            for n in range(items)
+        ]
+        if large:
+            objs.append(item(f"{name}-large", tracks=large, collection=name))
+        metadata.update((obj["metadata"]["identifier"], obj) for obj in objs)
+        metadata[name] = collection(name, name.title())
+        results[name] = docs(objs)
+    return metadata, results
+
+
+def load(path):
+    """Load recorded `items` and `collections` from a directory."""
+    path = pathlib.Path(path)
+    metadata = {
+        p.stem: json.loads(p.read_text())
+        for p in sorted(path.glob("metadata/*.json"))
+    }
+    results = {
+        p.stem: json.loads(p.read_text())
+        for p in sorted(path.glob("search/*.json"))
+    }
+    return metadata, results
@@ -0,0 +1,47 @@
+"""Record archive.org API responses as benchmark fixtures.
+
+Run with ``python -m benchmarks.record -o DIR COLLECTION...``.
+
+"""
+
+import argparse
+import json
+import pathlib
+
+from mopidy_internetarchive.client import InternetArchiveClient
+
+FIELDS = ["identifier", "mediatype", "title", "creator", "date", "downloads"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("collections", metavar="COLLECTION", nargs="+")
+    parser.add_argument("-B", "--base-url", default="http://archive.org")
+    parser.add_argument("-o", "--output", type=pathlib.Path, required=True)
+    parser.add_argument("-r", "--rows", type=int, default=10)
+    args = parser.parse_args()
+
+    client = InternetArchiveClient(args.base_url)
+    (args.output / "metadata").mkdir(parents=True, exist_ok=True)
+    (args.output / "search").mkdir(parents=True, exist_ok=True)
+
+    def save(path, obj):
+        with open(args.output / path, "w") as f:
+            json.dump(obj, f)
+
+    for name in args.collections:
+        save(f"metadata/{name}.json", client.getitem(name))
+        result = client.search(
+            f"collection:{name}",
+            fields=FIELDS,
+            sort=["downloads desc"],
+            rows=args.rows,
+        )
+        save(f"search/{name}.json", list(result))
+        for doc in result:
+            identifier = doc["identifier"]
+            save(f"metadata/{identifier}.json", client.getitem(identifier))
+
+
+if __name__ == "__main__":
+    main()
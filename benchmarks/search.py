@@ -0,0 +1,108 @@
+"""Compare single-query and fan-out searching across collections.
+
+Run with ``python -m benchmarks.search``.
+
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import random
+import statistics
+import time
+import types
+
+from mopidy_internetarchive import Extension
+from mopidy_internetarchive.client import InternetArchiveClient
+from mopidy_internetarchive.library import InternetArchiveLibraryProvider
+
+from .backend import make_config
+from .fakeserver import FakeArchive
+
+
+def make_collections(sizes, seed=0):
+    rng = random.Random(seed)
+    return {
+        name: [
+            {
+                "identifier": f"{name}-{i}",
+                "title": f"{name} #{i}",
+                "mediatype": "audio",
+                "downloads": rng.randrange(100000),
+            }
+            for i in range(size)
+        ]
+        for name, size in sizes.items()
+    }
+
+
+def make_library(base_url, names, fanout, limit, workers):
+    client = InternetArchiveClient(base_url)
+    backend = types.SimpleNamespace(
+        client=client,
+        executor=concurrent.futures.ThreadPoolExecutor(max_workers=workers),
+        metrics=None,
+    )
+    config = make_config(
+        collections=names,
+        audio_formats=["VBR MP3"],
+        image_formats=["JPEG"],
+        browse_views=collections.OrderedDict(),
+        search_limit=limit,
+        search_fanout=fanout,
+        search_fanout_timeout=None,
+    )[Extension.ext_name]
+    return InternetArchiveLibraryProvider(config, backend)
+
+
+def run(library, count):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        result = library.search({"any": ["foo"]})
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-c", "--count", type=int, default=20)
+    parser.add_argument("-l", "--limit", type=int, default=20)
+    parser.add_argument("-L", "--latency", type=float, default=0.05)
+    parser.add_argument("-S", "--scan-latency", type=float, default=1e-5)
+    parser.add_argument("-w", "--workers", type=int, default=10)
+    args = parser.parse_args()
+
+    sizes = {"etree": 20000, "audio": 5000, "librivoxaudio": 2000}
+    sizes.update((f"audio_{i}", 100) for i in range(7))
+    server = FakeArchive(
+        collections=make_collections(sizes),
+        latency=args.latency,
+        scan_latency=args.scan_latency,
+    )
+    with server:
+        for fanout in (False, True):
+            library = make_library(
+                server.base_url, list(sizes), fanout, args.limit, args.workers
+            )
+            server.requests.clear()
+            timings, result = run(library, args.count)
+            share = collections.Counter(
+                album.uri.partition(":")[2].partition("-")[0]
+                for album in result.albums
+            )
+            print(
+                "%-8s mean %.3fs  median %.3fs  max %.3fs  requests %d"
+                % (
+                    "fanout" if fanout else "single",
+                    statistics.mean(timings),
+                    statistics.median(timings),
+                    max(timings),
+                    server.requests["search"],
+                )
+            )
+            print("         collections: %s" % dict(share))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Benchmark translating item metadata to Mopidy models.
+
+Run with ``python -m benchmarks.translator``.
+
+"""
+
+import argparse
+import gc
+import json
+import timeit
+import tracemalloc
+
+import uritools
+from mopidy import models
+
+from mopidy_internetarchive import translator
+
+from . import fixtures
+
+FORMATS = ["VBR MP3", "64Kbps MP3"]
+
+
+def browse_tracks(item):
+    tracks = translator.tracks(item, FORMATS)
+    tracks.sort(key=lambda t: (t.track_no or 0, t.uri))
+    return [models.Ref.track(uri=t.uri, name=t.name) for t in tracks]
+
+
+def browse_refs(item):
+    return translator.refs(item, FORMATS)
+
+
+def compose_uritools(identifier, filenames):
+    for filename in filenames:
+        uritools.uricompose(
+            "internetarchive", path=identifier, fragment=filename
+        )
+
+
+def compose(identifier, filenames):
+    for filename in filenames:
+        translator.uri(identifier, filename)
+
+
+def parse_uritools(uris):
+    for uri in uris:
+        parts = uritools.urisplit(uri)
+        parts.path, parts.getfragment(), parts.getquerydict()
+
+
+def parse(uris):
+    for uri in uris:
+        translator.parse_uri(uri)
+
+
+def uris(items, number):
+    print("%-24s %9s %9s %9s" % ("uris", "uritools", "cold", "warm"))
+    identifier, item = max(items.items(), key=lambda i: len(i[1]["files"]))
+    filenames = [obj["name"] for obj in item["files"]]
+    track_uris = [translator.uri(identifier, name) for name in filenames]
+    for name, slow, fast, args in [
+        ("compose", compose_uritools, compose, (identifier, filenames)),
+        ("parse", parse_uritools, parse, (track_uris,)),
+    ]:
+        slow_time = timeit.timeit(lambda: slow(*args), number=number)
+        cold_time = 0
+        for _ in range(number):
+            translator._split.cache_clear()
+            translator._quote_path.cache_clear()
+            translator._quote_fragment.cache_clear()
+            cold_time += timeit.timeit(lambda: fast(*args), number=1)
+        warm_time = timeit.timeit(lambda: fast(*args), number=number)
+        print(
+            "%-24s %7.2fms %7.2fms %7.2fms"
+            % (
+                "%s (%d)" % (name, len(filenames)),
+                slow_time * 1000 / number,
+                cold_time * 1000 / number,
+                warm_time * 1000 / number,
+            )
+        )
+
+
+def memory(items):
+    # decode separately, as the client would, so strings are not shared
+    content = {k: json.dumps(v) for k, v in items.items()}
+    gc.collect()
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    tracks = []
+    for data in content.values():
+        tracks.extend(translator.tracks(json.loads(data), FORMATS))
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        "tracks memory: %d tracks, %.1f KiB, %d bytes/track"
+        % (
+            len(tracks),
+            (size - start) / 1024,
+            (size - start) / max(len(tracks), 1),
+        )
+    )
+
+
+def bulk(count, tracks, workers, number):
+    items = [
+        fixtures.item(f"bulk{n}", tracks=tracks, seed=n) for n in range(count)
+    ]
+    print("%-24s %9s %9s" % ("bulk translate", "serial", "processes"))
+    timings = [
+        timeit.timeit(
+            lambda: translator.bulk_translate(
+                items, FORMATS, ["JPEG"], max_workers=n
+            ),
+            number=number,
+        )
+        / number
+        for n in (1, workers)
+    ]
+    print(
+        "%-24s %s"
+        % (
+            "%d x %d (%d workers)" % (count, tracks, workers),
+            " ".join("%7.0fms" % (t * 1000) for t in timings),
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", "--fixtures", metavar="DIR")
+    parser.add_argument("-T", "--tracks", type=int, nargs="+")
+    parser.add_argument("-n", "--number", type=int, default=10)
+    parser.add_argument("-b", "--bulk", type=int, default=100)
+    parser.add_argument("-w", "--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.fixtures:
+        items, _ = fixtures.load(args.fixtures)
+    else:
+        items = {
+            f"item{n}": fixtures.item(f"item{n}", tracks=n)
+            for n in args.tracks or [20, 200, 2000]
+        }
+    funcs = {"tracks": browse_tracks, "refs": browse_refs}
+    print(
+        "%-24s %6s %s"
+        % ("item", "files", " ".join("%9s" % name for name in funcs))
+    )
+    for identifier, item in items.items():
+        assert browse_tracks(item) == browse_refs(item)
+        timings = [
+            timeit.timeit(lambda: func(item), number=args.number) / args.number
+            for func in funcs.values()
+        ]
+        print(
+            "%-24s %6d %s"
+            % (
+                identifier[:24],
+                len(item.get("files", [])),
+                " ".join("%7.2fms" % (t * 1000) for t in timings),
+            )
+        )
+    print()
+    uris(items, args.number)
+    print()
+    memory(items)
+    print()
+    bulk(args.bulk, 200, args.workers, 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -93,14 +93,38 @@ class Extension(ext.Extension):
             collections=config.List(),
             audio_formats=config.List(),
             image_formats=config.List(),
+            images_timeout=config.Float(minimum=0, optional=True),
             browse_limit=config.Integer(minimum=1, optional=True),
             browse_views=ConfigMap(keys=config.String(choices=SORT_FIELDS)),
+            browse_prefetch=config.Boolean(optional=True),
             search_limit=config.Integer(minimum=1, optional=True),
             search_order=config.String(choices=SORT_FIELDS, optional=True),
+            search_fanout=config.Boolean(optional=True),
+            search_fanout_timeout=config.Float(minimum=0, optional=True),
+            search_tracks=config.Integer(minimum=0, optional=True),
+            search_tracks_timeout=config.Float(minimum=0, optional=True),
+            refresh_background=config.Boolean(optional=True),
             cache_size=config.Integer(minimum=1, optional=True),
             cache_ttl=config.Integer(minimum=0, optional=True),
+            cache_compress=config.Boolean(optional=True),
+            revalidate_interval=config.Integer(minimum=1, optional=True),
+            revalidate_batch=config.Integer(minimum=1),
+            cache_negative_ttl=config.Integer(minimum=0, optional=True),
             retries=config.Integer(minimum=0),
             timeout=config.Integer(minimum=0, optional=True),
+            hedge_percentile=config.Float(
+                minimum=0, maximum=100, optional=True
+            ),
+            hedge_budget=config.Float(minimum=0, optional=True),
+            asyncio=config.Boolean(optional=True),
+            connections=config.Integer(minimum=1),
+            workers=config.Integer(minimum=1),
+            metrics=config.Boolean(optional=True),
+            metrics_interval=config.Integer(minimum=1, optional=True),
+            trace_file=config.Path(optional=True),
+            snapshot=config.Boolean(optional=True),
+            warmup=config.Boolean(optional=True),
+            warmup_items=config.List(optional=True),
             # no longer used
             browse_order=config.Deprecated(),
             exclude_collections=config.Deprecated(),
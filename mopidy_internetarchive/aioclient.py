@@ -0,0 +1,233 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+import urllib.parse
+
+import aiohttp
+
+from .client import (
+    BASE_URL,
+    InternetArchiveClient,
+    _decode,
+    _item,
+    _result,
+    geturl,
+)
+
+
+def _params(params):
+    # mimic requests: skip None values, expand sequences
+    items = []
+    for key, value in (params or {}).items():
+        if value is None:
+            continue
+        elif isinstance(value, (list, tuple)):
+            items.extend((key, str(v)) for v in value)
+        else:
+            items.append((key, str(value)))
+    return items
+
+
+class Response:
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return _decode(self.content)
+
+
+class EventLoopThread:
+    def __init__(self, name=None):
+        self.loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.__run, name=name)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.__thread.join()
+        self.loop.close()
+
+    def __run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+
+class AsyncInternetArchiveClient:
+    def __init__(
+        self, base_url=BASE_URL, retries=0, timeout=None, connections=10
+    ):
+        self.__base_url = base_url
+        self.__retries = retries
+        self.__timeout = aiohttp.ClientTimeout(total=timeout)
+        self.__connections = connections
+        self.__session = None
+        self.proxies = {}
+        self.useragent = None
+
+    async def getitem(self, identifier):
+        return _item(identifier, await self.get("/metadata/%s" % identifier))
+
+    def geturl(self, identifier, filename=None):
+        return geturl(self.__base_url, identifier, filename)
+
+    async def search(
+        self, query, fields=None, sort=None, rows=None, start=None
+    ):
+        return _result(
+            await self.get(
+                "/advancedsearch.php",
+                params={
+                    "q": query,
+                    "fl[]": fields,
+                    "sort[]": sort,
+                    "rows": rows,
+                    "start": start,
+                    "output": "json",
+                },
+            )
+        )
+
+    async def close(self):
+        if self.__session is not None:
+            await self.__session.close()
+            self.__session = None
+
+    async def get(self, path, params=None):
+        url = urllib.parse.urljoin(self.__base_url, path)
+        return await self.__request("GET", url, params)
+
+    async def head(self, url):
+        return await self.__request("HEAD", url)
+
+    async def __request(self, method, url, params=None):
+        if self.__session is None:
+            # connector limit provides pooling and bounds concurrency
+            self.__session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.__connections),
+                timeout=self.__timeout,
+            )
+        headers = {"Accept-Encoding": "gzip, deflate"}
+        if self.useragent:
+            headers["User-Agent"] = self.useragent
+        proxy = self.proxies.get(urllib.parse.urlsplit(url).scheme)
+        for retry in range(self.__retries + 1):
+            try:
+                async with self.__session.request(
+                    method,
+                    url,
+                    params=_params(params),
+                    headers=headers,
+                    proxy=proxy,
+                ) as response:
+                    return Response(
+                        str(response.url),
+                        response.status,
+                        response.headers,
+                        await response.read(),
+                    )
+            except aiohttp.ClientConnectionError:
+                if retry == self.__retries:
+                    raise
+
+
+class EventLoopClient(InternetArchiveClient):
+    """Blocking client running on a dedicated event loop thread."""
+
+    def __init__(
+        self, base_url=BASE_URL, retries=0, timeout=None, connections=10
+    ):
+        super().__init__(base_url, retries, timeout, connections)
+        self.__client = AsyncInternetArchiveClient(
+            base_url, retries, timeout, connections
+        )
+        self.__thread = EventLoopThread(name="InternetArchiveEventLoop")
+
+    @property
+    def proxies(self):
+        return self.__client.proxies
+
+    @property
+    def useragent(self):
+        return self.__client.useragent
+
+    @useragent.setter
+    def useragent(self, value):
+        self.__client.useragent = value
+
+    def getitems(self, identifiers):
+        """Return futures for retrieving multiple items concurrently.
+
+        Cached and known unknown items are looked up right away, and
+        all others are retrieved together on the event loop thread, so
+        no thread is blocked waiting for each of them.  Retrieved items
+        are cached even if nobody waits for their futures.
+
+        """
+        futures = []
+        for identifier in identifiers:
+            if self.__cached(identifier):
+                future = concurrent.futures.Future()
+                try:
+                    future.set_result(self.getitem(identifier))
+                except Exception as e:
+                    future.set_exception(e)
+            else:
+                future = self.submit(self.__getitem(identifier))
+            futures.append(future)
+        return futures
+
+    def submit(self, coro):
+        return self.__thread.submit(coro)
+
+    def close(self):
+        self.submit(self.__client.close()).result()
+        self.__thread.stop()
+
+    def poolstats(self):
+        return None  # not available from aiohttp
+
+    def _get(self, path, params=None):
+        return self.submit(self.__client.get(path, params)).result()
+
+    def _head(self, url):
+        return self.submit(self.__client.head(url)).result()
+
+    def _newsession(self, retries, connections):
+        return None  # requests are sent using aiohttp
+
+    def __cached(self, identifier):
+        cache = self.cache
+        negative = self.negative_cache
+        if cache is not None and identifier in cache:
+            return True
+        else:
+            return negative is not None and ("metadata", identifier) in negative
+
+    async def __getitem(self, identifier):
+        start = time.perf_counter()
+        try:
+            response = await self.__client.get("/metadata/%s" % identifier)
+        except Exception as e:
+            if self.metrics is not None:
+                name = type(e).__name__
+                self.metrics.count(f"http.metadata.error.{name}")
+            raise
+        if self.metrics is not None:
+            self._record("metadata", response, time.perf_counter() - start)
+        try:
+            item = self._item(identifier, response)
+        except LookupError as e:
+            if self.negative_cache is not None:
+                self._negative(("metadata", identifier), e)
+            raise
+        if self.cache is not None:
+            self.cache[identifier] = item
+        return item
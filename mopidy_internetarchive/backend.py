@@ -1,41 +1,313 @@
+import concurrent.futures
+import contextvars
+import logging
+import queue
+import threading
+import time
+
 import pykka
 from mopidy import backend, httpclient
+from pykka.messages import ProxyCall
 
-import cachetools
-
-from . import Extension
-from .client import InternetArchiveClient
+from . import Extension, snapshot, tracing
+from .cache import Cache, CompressedCache
+from .client import InternetArchiveClient, _decode, _dumps
+from .hedging import Hedge
 from .library import InternetArchiveLibraryProvider
+from .metrics import Metrics
 from .playback import InternetArchivePlaybackProvider
 
+logger = logging.getLogger(__name__)
+
+
+def _client(
+    base_url,
+    retries=0,
+    timeout=None,
+    asyncio=False,
+    connections=None,
+    **kwargs,
+):
+    if asyncio:
+        try:
+            from .aioclient import EventLoopClient
+        except ImportError as e:
+            logger.warning("Cannot use asyncio HTTP client: %s", e)
+        else:
+            return EventLoopClient(base_url, retries, timeout, connections)
+    return InternetArchiveClient(base_url, retries, timeout, connections)
+
+
+class WorkerPool(concurrent.futures.ThreadPoolExecutor):
+    def __init__(self, max_workers, thread_name_prefix=""):
+        super().__init__(max_workers, thread_name_prefix)
+        self.__lock = threading.Lock()
+        self.__queued = 0
+        self.__active = 0
+        self.__completed = 0
+        self.__max_queued = 0
+
+    def submit(self, fn, *args, **kwargs):
+        with self.__lock:
+            self.__queued += 1
+            self.__max_queued = max(self.__max_queued, self.__queued)
+        context = contextvars.copy_context()  # for tracing
+        try:
+            return super().submit(context.run, self.__run, fn, *args, **kwargs)
+        except Exception:
+            with self.__lock:
+                self.__queued -= 1
+            raise
+
+    def stats(self):
+        with self.__lock:
+            return {
+                "queued": self.__queued,
+                "active": self.__active,
+                "completed": self.__completed,
+                "max_queued": self.__max_queued,
+            }
 
-def _cache(cache_size=None, cache_ttl=None, **kwargs):
+    def __run(self, fn, *args, **kwargs):
+        with self.__lock:
+            self.__queued -= 1
+            self.__active += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self.__lock:
+                self.__active -= 1
+                self.__completed += 1
+
+
+class _Inbox(queue.Queue):
+    # actor inbox handing selected messages over to a worker pool
+    dispatch = None
+
+    def put(self, envelope, block=True, timeout=None):
+        if self.dispatch is None or not self.dispatch(envelope):
+            super().put(envelope, block, timeout)
+
+
+def _cache(cache_size=None, cache_ttl=None, cache_compress=False, **kwargs):
     if cache_size is None:
         return None
-    elif cache_ttl is None:
-        return cachetools.LRUCache(cache_size)
+    elif cache_compress:
+        return CompressedCache(
+            cache_size, cache_ttl, encode=_dumps, decode=_decode
+        )
     else:
-        return cachetools.TTLCache(cache_size, cache_ttl)
+        return Cache(cache_size, cache_ttl)
 
 
 class InternetArchiveBackend(pykka.ThreadingActor, backend.Backend):
 
     uri_schemes = [Extension.ext_name]
 
+    # library calls which may block on network I/O
+    dispatch_calls = frozenset(
+        ("library", name)
+        for name in ("browse", "get_images", "lookup", "refresh", "search")
+    )
+
+    # dispatch calls handled by the actor itself if served from cache
+    cached_calls = frozenset(("library", name) for name in ("browse", "lookup"))
+
     def __init__(self, config, audio):
         super().__init__()
         ext_config = config[Extension.ext_name]
+        tracing.configure(ext_config["trace_file"])
 
-        self.client = client = InternetArchiveClient(
-            ext_config["base_url"],
-            retries=ext_config["retries"],
-            timeout=ext_config["timeout"],
-        )
+        self.client = client = _client(**ext_config)
         product = f"{Extension.dist_name}/{Extension.version}"
         client.useragent = httpclient.format_user_agent(product)
         proxy = httpclient.format_proxy(config["proxy"])
         client.proxies.update({"http": proxy, "https": proxy})
         client.cache = _cache(**ext_config)
+        client.search_cache = _cache(
+            ext_config["cache_size"], ext_config["cache_ttl"]
+        )
+        if ext_config["cache_negative_ttl"]:
+            client.negative_cache = _cache(
+                ext_config["cache_size"], ext_config["cache_negative_ttl"]
+            )
+        if ext_config["hedge_percentile"]:
+            client.hedge = Hedge(
+                ext_config["hedge_percentile"],
+                ext_config["hedge_budget"] or 0,
+                max_workers=2 * ext_config["connections"],
+            )
+
+        if ext_config["metrics"]:
+            self.metrics = client.metrics = Metrics()
+        else:
+            self.metrics = None
+        self.__metrics_interval = ext_config["metrics_interval"]
+        if ext_config["snapshot"]:
+            self.__snapshot = (
+                Extension.get_cache_dir(config) / "snapshot.json.gz"
+            )
+        else:
+            self.__snapshot = None
+        self.__revalidate_interval = ext_config["revalidate_interval"]
+        self.__revalidate_batch = ext_config["revalidate_batch"]
+        self.__connections = ext_config["connections"]
+        self.__workers = ext_config["workers"]
+        self.__warmup = ext_config["warmup"]
+        self.__warmup_items = ext_config["warmup_items"] or []
+        self.__stopped = threading.Event()
+
+        self.executor = WorkerPool(
+            max_workers=ext_config["workers"],
+            thread_name_prefix=Extension.ext_name,
+        )
+        self.dispatcher = WorkerPool(
+            max_workers=ext_config["workers"],
+            thread_name_prefix=Extension.ext_name + "-dispatch",
+        )
 
         self.library = InternetArchiveLibraryProvider(ext_config, self)
         self.playback = InternetArchivePlaybackProvider(audio, self)
+
+    def on_start(self):
+        if self.__snapshot and self.__snapshot.exists():
+            try:
+                snapshot.restore(self.__snapshot, self.client, self.library)
+            except Exception as e:
+                logger.warning("Error restoring cache snapshot: %s", e)
+            else:
+                logger.debug("Restored cache snapshot %s", self.__snapshot)
+        # calls received before are handled by the actor after on_start
+        self.actor_inbox.dispatch = self.__dispatch
+        if self.metrics and self.__metrics_interval:
+            thread = threading.Thread(
+                target=self.__log_stats, name="InternetArchiveMetrics"
+            )
+            thread.daemon = True
+            thread.start()
+        if self.__revalidate_interval and self.client.cache is not None:
+            thread = threading.Thread(
+                target=self.__revalidate, name="InternetArchiveRevalidate"
+            )
+            thread.daemon = True
+            thread.start()
+        if self.__warmup:
+            for _ in range(min(self.__connections, self.__workers)):
+                self.executor.submit(self.__connect)
+            future = self.executor.submit(
+                self.library.warmup, self.__warmup_items
+            )
+            future.add_done_callback(self.__log_warmup)
+
+    def on_stop(self):
+        self.__stopped.set()
+        self.actor_inbox.dispatch = None
+        self.dispatcher.shutdown(wait=False)
+        self.executor.shutdown(wait=False)
+        if self.client.hedge is not None:
+            self.client.hedge.shutdown()
+        if self.__snapshot:
+            try:
+                snapshot.save(self.__snapshot, self.client, self.library)
+            except Exception as e:
+                logger.warning("Error saving cache snapshot: %s", e)
+            else:
+                logger.debug("Saved cache snapshot %s", self.__snapshot)
+        self.client.close()
+        tracing.configure(None)
+
+    def stats(self):
+        cache = self.client.cache
+        search_cache = self.client.search_cache
+        hedge = self.client.hedge
+        return {
+            "cache": cache.stats() if cache is not None else None,
+            "connections": self.client.poolstats(),
+            "dispatcher": self.dispatcher.stats(),
+            "executor": self.executor.stats(),
+            "hedge": hedge.stats() if hedge is not None else None,
+            "inbox": self.actor_inbox.qsize(),
+            "metrics": self.metrics.stats() if self.metrics else None,
+            "search_cache": (
+                search_cache.stats() if search_cache is not None else None
+            ),
+        }
+
+    def _create_actor_inbox(self):
+        # private Pykka API, see test_backend.test_inbox
+        return _Inbox()
+
+    def __log_stats(self):
+        while not self.__stopped.wait(self.__metrics_interval):
+            logger.info("%s stats: %s", Extension.dist_name, self.stats())
+
+    def __connect(self):
+        try:
+            self.client.connect()
+        except Exception as e:
+            logger.warning("Error connecting to %s: %s", Extension.dist_name, e)
+
+    def __revalidate(self):
+        interval = self.__revalidate_interval
+        while not self.__stopped.wait(interval):
+            # items expiring before the next but one revalidation
+            identifiers = self.client.cache.expiring(2 * interval)
+            identifiers = identifiers[: self.__revalidate_batch]
+            if not identifiers:
+                continue
+            try:
+                changed = self.client.revalidate(identifiers)
+            except Exception as e:
+                logger.warning("Error revalidating cache: %s", e)
+            else:
+                logger.debug(
+                    "Revalidated %d items, %d changed",
+                    len(identifiers),
+                    len(changed),
+                )
+
+    def __log_warmup(self, future):
+        if future.cancelled():
+            return
+        try:
+            logger.debug("Warming up %d requests", len(future.result()))
+        except Exception as e:
+            logger.warning("Error warming up %s: %s", Extension.dist_name, e)
+
+    def __dispatch(self, envelope):
+        message = envelope.message
+        if not isinstance(message, ProxyCall):
+            return False
+        path = tuple(message.attr_path)
+        if path not in self.dispatch_calls:
+            return False
+        if path in self.cached_calls and self.library.cached(
+            *message.args, **message.kwargs
+        ):
+            return False  # do not wait for workers busy with requests
+        try:
+            self.dispatcher.submit(self.__call, envelope, time.time())
+        except RuntimeError:
+            return False  # shutting down
+        else:
+            return True
+
+    def __call(self, envelope, queued):
+        message = envelope.message
+        name = ".".join(message.attr_path)
+        try:
+            with tracing.span(name, start=queued, args=message.args):
+                with tracing.span("actor.queue", start=queued):
+                    pass
+                callee = self
+                for attr in message.attr_path:
+                    callee = getattr(callee, attr)
+                result = callee(*message.args, **message.kwargs)
+        except Exception:
+            if envelope.reply_to is None:
+                logger.exception("Error calling %s", name)
+            else:
+                envelope.reply_to.set_exception()
+        else:
+            if envelope.reply_to is not None:
+                envelope.reply_to.set(result)
@@ -0,0 +1,350 @@
+import collections.abc
+import concurrent.futures
+import operator
+import threading
+import time
+import zlib
+
+import cachetools
+
+
+class _LRUCache(cachetools.LRUCache):
+    evictions = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+
+class _TTLCache(cachetools.TTLCache):
+    evictions = 0
+
+    def __init__(self, maxsize, ttl, timer):
+        # timer offset for inserting items with a shorter time-to-live
+        self.__offset = 0
+        self.__expires = {}
+        super().__init__(maxsize, ttl, lambda: timer() - self.__offset)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.__expires[key] = self.timer() + self.ttl
+        if len(self.__expires) > 2 * self.maxsize:
+            self.__prune()
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+    def setttl(self, key, value, ttl):
+        self.__offset = max(self.ttl - ttl, 0)
+        try:
+            self[key] = value
+        finally:
+            self.__offset = 0
+
+    def entries(self):
+        return [
+            (key, cachetools.Cache.__getitem__(self, key), ttl)
+            for key, ttl in self.ttls()
+        ]
+
+    def ttls(self):
+        self.__prune()
+        now = self.timer()
+        return [(key, exp - now) for key, exp in self.__expires.items()]
+
+    def __prune(self):
+        # expired items are removed without calling __delitem__
+        self.__expires = {
+            key: expires
+            for key, expires in self.__expires.items()
+            if key in self
+        }
+
+
+class _Shard:
+    def __init__(self, cache):
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.pending = {}  # key -> Future for values being computed
+        self.hits = self.misses = 0
+
+
+def _ttl(entry):
+    return entry[2] if entry[2] is not None else float("inf")
+
+
+class Cache(collections.abc.MutableMapping):
+    """Thread-safe, lock-striped LRU/TTL cache.
+
+    Keys are distributed over up to `stripes` independent shards, each
+    guarded by its own lock, so threads accessing different keys rarely
+    contend.  Any shard may hold up to `maxsize` entries, so `maxsize`
+    entries fit regardless of how keys are distributed; beyond that,
+    the least recently used entries of the largest shards are evicted.
+    Shards hold at least `MIN_STRIPE_SIZE` entries on average, so small
+    caches use a single shard and evict strictly least recently used
+    entries.
+
+    """
+
+    MIN_STRIPE_SIZE = 16
+
+    def __init__(self, maxsize, ttl=None, stripes=8, timer=time.monotonic):
+        stripes = max(1, min(stripes, maxsize // self.MIN_STRIPE_SIZE))
+        if ttl is None:
+            caches = [_LRUCache(maxsize) for _ in range(stripes)]
+        else:
+            caches = [_TTLCache(maxsize, ttl, timer) for _ in range(stripes)]
+        self.__shards = [_Shard(cache) for cache in caches]
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+    def __getitem__(self, key):
+        shard = self.__shard(key)
+        with shard.lock:
+            return shard.cache[key]
+
+    def __setitem__(self, key, value):
+        shard = self.__shard(key)
+        with shard.lock:
+            shard.cache[key] = value
+        self.__evict()
+
+    def __delitem__(self, key):
+        shard = self.__shard(key)
+        with shard.lock:
+            del shard.cache[key]
+
+    def __contains__(self, key):
+        shard = self.__shard(key)
+        with shard.lock:
+            return key in shard.cache
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return sum(len(shard.cache) for shard in self.__shards)
+
+    def keys(self):
+        # snapshot, since shards may be modified while iterating
+        keys = []
+        for shard in self.__shards:
+            with shard.lock:
+                keys.extend(shard.cache.keys())
+        return keys
+
+    def get(self, key, default=None):
+        shard = self.__shard(key)
+        with shard.lock:
+            return shard.cache.get(key, default)
+
+    def pop(self, key, *args):
+        shard = self.__shard(key)
+        with shard.lock:
+            return shard.cache.pop(key, *args)
+
+    def clear(self):
+        for shard in self.__shards:
+            with shard.lock:
+                shard.cache.clear()
+
+    def stats(self):
+        return {
+            "hits": sum(shard.hits for shard in self.__shards),
+            "misses": sum(shard.misses for shard in self.__shards),
+            "evictions": sum(s.cache.evictions for s in self.__shards),
+            "size": len(self),
+            "maxsize": self.maxsize,
+        }
+
+    def dump(self):
+        """Return a list of `(key, value, ttl)` tuples for all entries.
+
+        `ttl` is the remaining time-to-live of an entry in seconds, or
+        :const:`None` if entries do not expire.
+
+        """
+        entries = []
+        for shard in self.__shards:
+            with shard.lock:
+                if self.ttl is None:
+                    entries.extend((k, v, None) for k, v in shard.cache.items())
+                else:
+                    entries.extend(shard.cache.entries())
+        return entries
+
+    def load(self, entries):
+        """Add `(key, value, ttl)` tuples as returned by :meth:`dump`."""
+        for key, value, ttl in sorted(entries, key=_ttl):
+            shard = self.__shard(key)
+            with shard.lock:
+                if self.ttl is None or ttl is None:
+                    shard.cache[key] = value
+                elif ttl > 0:
+                    shard.cache.setttl(key, value, ttl)
+            self.__evict()
+
+    def expiring(self, seconds):
+        """Return keys expiring within `seconds`, soonest first."""
+        if self.ttl is None:
+            return []
+        entries = []
+        for shard in self.__shards:
+            with shard.lock:
+                entries.extend(e for e in shard.cache.ttls() if e[1] < seconds)
+        return [key for key, _ in sorted(entries, key=operator.itemgetter(1))]
+
+    def touch(self, key):
+        """Reset the time-to-live of `key`, if present."""
+        shard = self.__shard(key)
+        with shard.lock:
+            try:
+                shard.cache[key] = shard.cache[key]
+            except KeyError:
+                pass
+
+    def get_or_compute(self, key, func, *args, **kwargs):
+        """Return the value for `key`, computing it if not present.
+
+        If `key` is not cached, ``func(*args, **kwargs)`` is called
+        to compute its value.  Concurrent callers for the same `key`
+        wait for a single computation to finish.  Exceptions are
+        propagated to all waiting callers, but are not cached.
+
+        """
+        shard = self.__shard(key)
+        with shard.lock:
+            try:
+                value = shard.cache[key]
+            except KeyError:
+                shard.misses += 1
+            else:
+                shard.hits += 1
+                return value
+            try:
+                future = shard.pending[key]
+            except KeyError:
+                future = shard.pending[key] = concurrent.futures.Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            return future.result()
+        try:
+            value = func(*args, **kwargs)
+        except BaseException as e:
+            with shard.lock:
+                del shard.pending[key]
+            future.set_exception(e)
+            raise
+        with shard.lock:
+            try:
+                shard.cache[key] = value
+            except ValueError:
+                pass  # value too large
+            del shard.pending[key]
+        future.set_result(value)
+        self.__evict()
+        return value
+
+    def __evict(self):
+        while len(self) > self.maxsize:
+            shard = max(self.__shards, key=lambda shard: len(shard.cache))
+            with shard.lock:
+                if self.ttl is not None:
+                    shard.cache.expire()
+                if len(self) > self.maxsize and shard.cache:
+                    shard.cache.popitem()
+
+    def __shard(self, key):
+        return self.__shards[hash(key) % len(self.__shards)]
+
+
+class CompressedCache(Cache):
+    """Cache storing values compressed, with a small decoded hot tier.
+
+    Values are converted to bytes using `encode` and compressed with
+    zlib.  The `hot` most recently used values are also kept decoded,
+    so they need not be decompressed and decoded again.
+
+    """
+
+    def __init__(self, maxsize, ttl=None, hot=16, encode=None, decode=None):
+        super().__init__(maxsize, ttl)
+        self.__hot = Cache(min(hot, maxsize), ttl, stripes=1)
+        self.__encode = encode
+        self.__decode = decode
+
+    def __getitem__(self, key):
+        return self.__decode(zlib.decompress(super().__getitem__(key)))
+
+    def __setitem__(self, key, value):
+        self.__hot.pop(key, None)
+        super().__setitem__(key, zlib.compress(self.__encode(value)))
+
+    def __delitem__(self, key):
+        self.__hot.pop(key, None)
+        super().__delitem__(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key, *args):
+        self.__hot.pop(key, None)
+        try:
+            value = super().pop(key)
+        except KeyError:
+            if args:
+                return args[0]
+            raise
+        return self.__decode(zlib.decompress(value))
+
+    def clear(self):
+        super().clear()
+        self.__hot.clear()
+
+    def stats(self):
+        stats = super().stats()
+        hot = self.__hot.stats()
+        stats["hits"] += hot["hits"]
+        stats["hot"] = hot
+        return stats
+
+    def dump(self):
+        return [
+            (key, self.__decode(zlib.decompress(value)), ttl)
+            for key, value, ttl in super().dump()
+        ]
+
+    def load(self, entries):
+        super().load(
+            (key, zlib.compress(self.__encode(value)), ttl)
+            for key, value, ttl in entries
+        )
+
+    def get_or_compute(self, key, func, *args, **kwargs):
+        if key not in self:  # hot values must not outlive cached values
+            self.__hot.pop(key, None)
+        return self.__hot.get_or_compute(
+            key, self.__compute, key, func, args, kwargs
+        )
+
+    def __compute(self, key, func, args, kwargs):
+        values = []
+
+        def compute():
+            values.append(func(*args, **kwargs))
+            return zlib.compress(self.__encode(values[0]))
+
+        data = super().get_or_compute(key, compute)
+        if values:
+            return values[0]
+        else:
+            return self.__decode(zlib.decompress(data))
@@ -1,20 +1,47 @@
 from collections.abc import Sequence
 
-import operator
+import json
+import logging
+import threading
+import time
 import urllib.parse
 
 import requests
 
-import cachetools
+from . import tracing
+
+try:
+    from orjson import dumps as _dumps, loads as _loads
+except ImportError:
+    _loads = json.loads
+
+    def _dumps(obj):
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
 
 BASE_URL = "http://archive.org/"
 
+logger = logging.getLogger(__name__)
+
+
+def geturl(base_url, identifier, filename=None):
+    if filename:
+        path = f"/download/{identifier}/{filename}"
+    else:
+        path = "/download/%s" % identifier
+    return urllib.parse.urljoin(base_url, path)
 
-def _session(base_url, retries):
+
+def _session(retries, connections):
     # TODO: backoff?
     session = requests.Session()
-    adapter = requests.adapters.HTTPAdapter(max_retries=retries)
-    session.mount(base_url, adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    # one adapter for all hosts, since base_url may redirect to https
+    adapter = requests.adapters.HTTPAdapter(
+        pool_maxsize=connections, pool_block=True, max_retries=retries
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
     return session
 
 
@@ -22,11 +49,19 @@ class InternetArchiveClient:
 
     pykka_traversable = True
 
-    def __init__(self, base_url=BASE_URL, retries=0, timeout=None):
+    def __init__(
+        self, base_url=BASE_URL, retries=0, timeout=None, connections=10
+    ):
         self.__base_url = base_url
-        self.__session = _session(base_url, retries)
+        self.__session = self._newsession(retries, connections)
         self.__timeout = timeout
         self.cache = None  # public
+        self.hedge = None  # public
+        self.negative_cache = None  # public
+        self.search_cache = None  # public
+        self.metrics = None  # public
+        self.__indexdates = {}  # for revalidation
+        self.__lock = threading.Lock()
 
     @property
     def proxies(self):
@@ -40,49 +75,227 @@ class InternetArchiveClient:
     def useragent(self, value):
         self.__session.headers["User-Agent"] = value
 
-    @cachetools.cachedmethod(operator.attrgetter("cache"))
-    def getitem(self, identifier):
-        obj = self.__get("/metadata/%s" % identifier).json()
-        if not obj:
-            raise LookupError(identifier)
-        elif "error" in obj:
-            raise LookupError(obj["error"])
-        elif "result" in obj:
-            return obj["result"]
-        else:
-            return obj
+    def connect(self):
+        """Open a connection to the Internet Archive for later requests."""
+        with tracing.span("client.connect"):
+            start = time.perf_counter()
+            response = self._head(self.__base_url)
+        if self.metrics is not None:
+            self.metrics.observe("http.connect", time.perf_counter() - start)
+            self.metrics.count(f"http.connect.status.{response.status_code}")
+
+    def getitem(self, identifier, refresh=False):
+        with tracing.span("client.getitem", identifier=identifier):
+            return self.__negative(
+                ("metadata", identifier),
+                refresh,
+                self.__cached,
+                self.cache,
+                identifier,
+                refresh,
+                self.__getitem,
+                identifier,
+            )
 
     def geturl(self, identifier, filename=None):
-        if filename:
-            path = f"/download/{identifier}/{filename}"
-        else:
-            path = "/download/%s" % identifier
-        return urllib.parse.urljoin(self.__base_url, path)
-
-    def search(self, query, fields=None, sort=None, rows=None, start=None):
-        response = self.__get(
-            "/advancedsearch.php",
-            params={
-                "q": query,
-                "fl[]": fields,
-                "sort[]": sort,
-                "rows": rows,
-                "start": start,
-                "output": "json",
-            },
+        return geturl(self.__base_url, identifier, filename)
+
+    def revalidate(self, identifiers):
+        """Revalidate cached items using a single search request.
+
+        Items whose index date changed since they were retrieved or
+        last revalidated, or is not known, are retrieved again, items
+        no longer found are removed from the cache, and the
+        time-to-live of all other items is reset.
+        Returns the list of identifiers retrieved again.
+
+        """
+        with tracing.span("client.revalidate", count=len(identifiers)):
+            result = self.__search(
+                "identifier:(%s)" % " OR ".join(identifiers),
+                ["identifier", "indexdate"],
+                None,
+                len(identifiers),
+                None,
+            )
+        dates = {doc["identifier"]: doc.get("indexdate") for doc in result}
+        with self.__lock:
+            self.__indexdates = last = {
+                k: v for k, v in self.__indexdates.items() if k in self.cache
+            }
+        changed = []
+        for identifier in identifiers:
+            if identifier not in dates:
+                self.cache.pop(identifier, None)
+            elif last.get(identifier) != dates[identifier]:
+                changed.append(identifier)
+            else:
+                self.cache.touch(identifier)
+        retrieved = []
+        for identifier in changed:
+            try:
+                self.getitem(identifier, refresh=True)
+            except LookupError:
+                self.cache.pop(identifier, None)
+            except Exception as e:
+                # keep the old index date, so this is retried next time
+                logger.warning("Error revalidating %s: %s", identifier, e)
+            else:
+                with self.__lock:
+                    self.__indexdates[identifier] = dates[identifier]
+                retrieved.append(identifier)
+        if self.metrics is not None:
+            self.metrics.count("cache.revalidated", len(identifiers))
+            self.metrics.count("cache.revalidated.changed", len(changed))
+        return retrieved
+
+    def search(
+        self,
+        query,
+        fields=None,
+        sort=None,
+        rows=None,
+        start=None,
+        refresh=False,
+    ):
+        with tracing.span("client.search", query=query):
+            key = (query, _key(fields), _key(sort), rows, start)
+            return self.__negative(
+                ("search", key),
+                refresh,
+                self.__cached,
+                self.search_cache,
+                key,
+                refresh,
+                self.__search,
+                query,
+                fields,
+                sort,
+                rows,
+                start,
+            )
+
+    def close(self):
+        self.__session.close()
+
+    def poolstats(self):
+        adapters = {id(a): a for a in self.__session.adapters.values()}
+        pools = []
+        for adapter in adapters.values():
+            container = adapter.poolmanager.pools
+            pools.extend(container[key] for key in container.keys())
+        return {
+            "pools": len(pools),
+            "connections": sum(pool.num_connections for pool in pools),
+            "requests": sum(pool.num_requests for pool in pools),
+        }
+
+    def __get(self, endpoint, path, params=None):
+        with tracing.span("http.get", path=path) as span:
+            start = time.perf_counter()
+            try:
+                # only hedge small, uniform metadata requests
+                if self.hedge is None or endpoint != "metadata":
+                    response = self._get(path, params)
+                else:
+                    response = self.hedge(self._get, path, params)
+            except Exception as e:
+                if self.metrics is not None:
+                    name = type(e).__name__
+                    self.metrics.count(f"http.{endpoint}.error.{name}")
+                raise
+            span.set(status=response.status_code)
+        if self.metrics is not None:
+            self._record(endpoint, response, time.perf_counter() - start)
+        return response
+
+    def __getitem(self, identifier):
+        return self._item(
+            identifier, self.__get("metadata", "/metadata/%s" % identifier)
         )
-        if response.content:
-            return self.SearchResult(response.json())
+
+    def __cached(self, cache, key, refresh, func, *args):
+        if cache is None:
+            return func(*args)
+        elif refresh:
+            value = func(*args)
+            cache[key] = value  # replace cached value only when retrieved
+            return value
         else:
-            raise self.SearchError(response.url)
+            return cache.get_or_compute(key, func, *args)
+
+    def __negative(self, key, refresh, func, *args):
+        # remember unknown items and invalid queries for a short time
+        if self.negative_cache is None:
+            return func(*args)
+        error = None if refresh else self.negative_cache.get(key)
+        if error is not None:
+            if self.metrics is not None:
+                self.metrics.count("cache.negative.hits")
+            raise type(error)(*error.args)
+        try:
+            value = func(*args)
+        except (LookupError, self.SearchError) as e:
+            self._negative(key, e)
+            raise
+        if refresh:
+            self.negative_cache.pop(key, None)
+        return value
+
+    def __search(self, query, fields, sort, rows, start):
+        return _result(
+            self.__get(
+                "search",
+                "/advancedsearch.php",
+                params={
+                    "q": query,
+                    "fl[]": fields,
+                    "sort[]": sort,
+                    "rows": rows,
+                    "start": start,
+                    "output": "json",
+                },
+            )
+        )
+
+    def _item(self, identifier, response):
+        item = _item(identifier, response)
+        indexdate = item.get("metadata", {}).get("indexdate")
+        if indexdate is not None:
+            with self.__lock:
+                self.__indexdates[identifier] = indexdate
+        return item
+
+    def _negative(self, key, error):
+        self.negative_cache[key] = error
+        if self.metrics is not None:
+            self.metrics.count("cache.negative.stores")
 
-    def __get(self, path, params=None):
+    def _newsession(self, retries, connections):
+        return _session(retries, connections)
+
+    def _record(self, endpoint, response, latency):
+        metrics = self.metrics
+        metrics.observe(f"http.{endpoint}", latency)
+        metrics.count(f"http.{endpoint}.status.{response.status_code}")
+        try:
+            size = int(response.headers["Content-Length"])
+        except (KeyError, ValueError):
+            size = len(response.content)
+        metrics.count(f"http.{endpoint}.bytes", size)
+
+    def _get(self, path, params=None):
         return self.__session.get(
             urllib.parse.urljoin(self.__base_url, path),
             params=params,
             timeout=self.__timeout,
         )
 
+    def _head(self, url):
+        return self.__session.head(
+            url, allow_redirects=True, timeout=self.__timeout
+        )
+
     class SearchResult(Sequence):
         def __init__(self, result):
             response = result["response"]
@@ -107,10 +320,45 @@ class InternetArchiveClient:
         pass
 
 
+def _key(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(value)
+    else:
+        return value
+
+
+def _decode(content):
+    try:
+        return _loads(content)
+    except ValueError:
+        return json.loads(content)  # e.g. integers out of range for orjson
+
+
+def _item(identifier, response):
+    with tracing.span("json.decode"):
+        obj = _decode(response.content)
+    if not obj:
+        raise LookupError(identifier)
+    elif "error" in obj:
+        raise LookupError(obj["error"])
+    elif "result" in obj:
+        return obj["result"]
+    else:
+        return obj
+
+
+def _result(response):
+    if response.content:
+        with tracing.span("json.decode"):
+            obj = _decode(response.content)
+        return InternetArchiveClient.SearchResult(obj)
+    else:
+        raise InternetArchiveClient.SearchError(response.url)
+
+
 if __name__ == "__main__":
     import argparse
     import logging
-    import json
     import sys
 
     parser = argparse.ArgumentParser()
@@ -0,0 +1,102 @@
+import collections
+import concurrent.futures
+import contextvars
+import threading
+import time
+
+
+class Hedge:
+    """Send a backup request if a request is slower than usual.
+
+    A backup request is sent once the `percentile` of recently observed
+    latencies has elapsed without a response, and the first response
+    is used.  Backup requests are limited to `budget` times the number
+    of requests, and are only sent after `samples` latencies have been
+    observed.
+
+    """
+
+    def __init__(
+        self, percentile=95, budget=0.05, max_workers=None, samples=20
+    ):
+        self.percentile = percentile
+        self.budget = budget
+        self.__executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers, thread_name_prefix="InternetArchiveHedge"
+        )
+        self.__lock = threading.Lock()
+        self.__latencies = collections.deque(maxlen=1000)
+        self.__samples = samples
+        self.__observed = 0
+        self.__delay = None
+        self.__requests = 0
+        self.__hedged = 0
+        self.__wins = 0
+
+    def __call__(self, func, *args):
+        delay = self.delay()
+        with self.__lock:
+            self.__requests += 1
+        first = self.__submit(func, *args)
+        if delay is None:
+            return first.result()
+        try:
+            return first.result(timeout=delay)
+        except concurrent.futures.TimeoutError:
+            pass
+        with self.__lock:
+            if self.__hedged >= self.__requests * self.budget:
+                hedge = False
+            else:
+                hedge = True
+                self.__hedged += 1
+        if not hedge:
+            return first.result()
+        second = self.__submit(func, *args)
+        futures = [first, second]
+        for future in concurrent.futures.as_completed(futures):
+            futures.remove(future)
+            if future.exception() is None or not futures:
+                if future is second:
+                    with self.__lock:
+                        self.__wins += 1
+                return future.result()
+
+    def delay(self):
+        with self.__lock:
+            return self.__delay
+
+    def shutdown(self):
+        self.__executor.shutdown(wait=False)
+
+    def stats(self):
+        with self.__lock:
+            return {
+                "delay": self.__delay,
+                "requests": self.__requests,
+                "hedged": self.__hedged,
+                "wins": self.__wins,
+            }
+
+    def __observe(self, latency):
+        with self.__lock:
+            latencies = self.__latencies
+            latencies.append(latency)
+            self.__observed += 1
+            # recompute periodically, sorting is cheap for small windows
+            if self.__observed >= self.__samples and (
+                self.__delay is None or self.__observed % 10 == 0
+            ):
+                values = sorted(latencies)
+                index = int(len(values) * self.percentile / 100)
+                self.__delay = values[min(index, len(values) - 1)]
+
+    def __run(self, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.__observe(time.perf_counter() - start)
+        return result
+
+    def __submit(self, func, *args):
+        context = contextvars.copy_context()  # for tracing
+        return self.__executor.submit(context.run, self.__run, func, *args)
@@ -1,13 +1,51 @@
 import collections
+import concurrent.futures
+import contextlib
 import logging
+import operator
+import threading
 
 from mopidy import backend, models
 
-from . import Extension, translator
+from . import Extension, tracing, translator
+from .cache import Cache
 
 logger = logging.getLogger(__name__)
 
 
+def _merge(results, limit=None):
+    # interleave by rank and downloads, each result getting its quota first
+    ranked = sorted(
+        (
+            (rank, -(doc.get("downloads") or 0), index, doc)
+            for index, docs in enumerate(results)
+            for rank, doc in enumerate(docs)
+        ),
+        key=operator.itemgetter(0, 1, 2),
+    )
+    quota = -(-limit // len(results)) if limit and results else None
+    counts = collections.Counter()
+    docs, rest, seen = [], [], set()
+    for _, _, index, doc in ranked:
+        if doc["identifier"] in seen:
+            continue
+        seen.add(doc["identifier"])
+        if quota is None or counts[index] < quota:
+            counts[index] += 1
+            docs.append(doc)
+        else:
+            rest.append(doc)
+    return (docs + rest)[:limit]
+
+
+def _log_error(message):
+    def log(future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(message, future.exception())
+
+    return log
+
+
 class InternetArchiveLibraryProvider(backend.LibraryProvider):
 
     root_directory = models.Ref.directory(
@@ -19,28 +57,43 @@ class InternetArchiveLibraryProvider(backend.LibraryProvider):
         self.__collections = config["collections"]
         self.__audio_formats = config["audio_formats"]
         self.__image_formats = config["image_formats"]
+        self.__images_timeout = config["images_timeout"]
 
         self.__browse_filter = "(mediatype:collection OR format:(%s))" % (
             " OR ".join(map(translator.quote, config["audio_formats"]))
         )
         self.__browse_limit = config["browse_limit"]
         self.__browse_views = config["browse_views"]
+        self.__browse_prefetch = config["browse_prefetch"]
 
         self.__search_filter = "format:(%s)" % (
             " OR ".join(map(translator.quote, config["audio_formats"]))
         )
         self.__search_limit = config["search_limit"]
         self.__search_order = config["search_order"]
+        self.__search_tracks = config["search_tracks"]
+        self.__search_tracks_timeout = config["search_tracks_timeout"]
+        self.__search_fanout = config["search_fanout"]
+        self.__search_fanout_timeout = config["search_fanout_timeout"]
+        self.__refresh_background = config["refresh_background"]
 
         self.__directories = collections.OrderedDict()
         self.__lookup = {}  # track cache for faster lookup
+        if config["cache_size"]:
+            # data derived from cached items, e.g. file indexes and tracks
+            self.__derived = Cache(config["cache_size"], config["cache_ttl"])
+        else:
+            self.__derived = None
+        self.__lock = threading.Lock()  # for browsing root directory
 
     def browse(self, uri):
         identifier, filename, query = translator.parse_uri(uri)
         if filename:
             return []
+        elif identifier and "sort" in query:
+            return self.__browse_collection(identifier, query["sort"])
         elif identifier and query:
-            return self.__browse_collection(identifier, **query)
+            return self.__browse_collection(identifier)
         elif identifier:
             return self.__browse_item(identifier)
         else:
@@ -57,13 +110,11 @@ class InternetArchiveLibraryProvider(backend.LibraryProvider):
                 logger.debug("Not retrieving images for %s", uri)
         # retrieve item images and map back to uris
         results = {}
-        for identifier, uris in urimap.items():
-            try:
-                item = self.backend.client.getitem(identifier)
-            except Exception as e:
-                logger.error("Error retrieving images for %s: %s", uris, e)
-            else:
-                results.update(dict.fromkeys(uris, self.__images(item)))
+        items = self.__getitems(list(urimap), self.__images_timeout, "images")
+        for identifier, item in items.items():
+            results.update(
+                dict.fromkeys(urimap[identifier], self.__images(item))
+            )
         return results
 
     def lookup(self, uri):
@@ -75,16 +126,32 @@ class InternetArchiveLibraryProvider(backend.LibraryProvider):
         if identifier:
             tracks = self.__tracks(self.backend.client.getitem(identifier))
             self.__lookup = trackmap = {t.uri: t for t in tracks}
-            return [trackmap[uri]] if filename else tracks
+            return [trackmap[uri]] if filename else list(tracks)
         else:
             return []
 
+    def cached(self, uri):
+        """Return whether `uri` can be browsed or looked up from cache."""
+        if uri in self.__lookup:
+            return True
+        cache = self.backend.client.cache
+        try:
+            identifier, _, query = translator.parse_uri(uri)
+        except ValueError:
+            return False
+        if identifier and not query and cache is not None:
+            return identifier in cache
+        else:
+            return False
+
     def refresh(self, uri=None):
-        client = self.backend.client
-        if client.cache:
-            client.cache.clear()
-        self.__directories.clear()
-        self.__lookup.clear()
+        if uri is None:
+            self.__clear()
+        elif self.__refresh_background:
+            future = self.backend.executor.submit(self.__refresh, uri)
+            future.add_done_callback(_log_error("Error refreshing: %s"))
+        else:
+            self.__refresh(uri)
 
     def search(self, query=None, uris=None, exact=False):
         # sanitize uris
@@ -101,19 +168,63 @@ class InternetArchiveLibraryProvider(backend.LibraryProvider):
         else:
             logger.debug("Internet Archive query: %s" % qs)
         # fetch results
-        result = self.backend.client.search(
-            f"{qs} AND {self.__search_filter}",
-            fields=["identifier", "title", "creator", "date"],
-            rows=self.__search_limit,
-            sort=self.__search_order,
-        )
-        logger.debug("Internet Archive result: %s" % list(result))
+        if self.__search_fanout and len(uris) > 1:
+            docs = self.__fanout(query, sorted(uris))
+            uri = translator.uri(q=qs)
+        else:
+            result = self.backend.client.search(
+                f"{qs} AND {self.__search_filter}",
+                fields=["identifier", "title", "creator", "date"],
+                rows=self.__search_limit,
+                sort=self.__search_order,
+            )
+            docs = list(result)
+            uri = translator.uri(q=result.query)
+        logger.debug("Internet Archive result: %s" % docs)
+        if self.__search_tracks:
+            tracks = self.__expand(docs[: self.__search_tracks])
+        else:
+            tracks = []
         return models.SearchResult(
-            uri=translator.uri(q=result.query),
-            albums=[translator.album(item) for item in result],
+            uri=uri,
+            albums=[translator.album(doc) for doc in docs],
+            tracks=tracks,
         )
 
-    def __browse_collection(self, identifier, sort=("downloads desc",)):
+    def dump(self):
+        with self.__lock:
+            directories = list(self.__directories.values())
+        return {
+            "collections": list(self.__collections),
+            "directories": directories,
+            "tracks": list(self.__lookup.values()),
+        }
+
+    def load(self, state):
+        # directories depend on configured collections
+        if state["collections"] == list(self.__collections):
+            with self.__lock:
+                for ref in state["directories"]:
+                    identifier, _, _ = translator.parse_uri(ref.uri)
+                    self.__directories[identifier] = ref
+        self.__lookup = {t.uri: t for t in state["tracks"]}
+
+    def warmup(self, identifiers=()):
+        submit = self.backend.executor.submit
+        futures = []
+        with tracing.span("library.warmup"):
+            for ref in self.__browse_root():
+                identifier, _, _ = translator.parse_uri(ref.uri)
+                futures.extend(self.__prefetch(self.__views(identifier)))
+            for identifier in identifiers:
+                futures.append(submit(self.backend.client.getitem, identifier))
+        for future in futures:
+            future.add_done_callback(_log_error("Error warming up cache: %s"))
+        return futures
+
+    def __browse_collection(
+        self, identifier, sort=("downloads desc",), refresh=False
+    ):
         return [
             translator.ref(res)
             for res in self.backend.client.search(
@@ -121,43 +232,211 @@ class InternetArchiveLibraryProvider(backend.LibraryProvider):
                 fields=["identifier", "mediatype", "title", "creator"],
                 rows=self.__browse_limit,
                 sort=sort,
+                refresh=refresh,
             )
         ]
 
     def __browse_item(self, identifier):
-        if identifier in self.__directories:
-            return self.__views(identifier)
-        item = self.backend.client.getitem(identifier)
-        if item["metadata"]["mediatype"] == "collection":
-            return self.__views(identifier)
-        tracks = self.__tracks(item)
-        self.__lookup = {t.uri: t for t in tracks}  # cache tracks
-        return [models.Ref.track(uri=t.uri, name=t.name) for t in tracks]
+        if identifier not in self.__directories:
+            item = self.backend.client.getitem(identifier)
+            if item["metadata"]["mediatype"] != "collection":
+                # tracks are created on lookup
+                with self.__timer("translator.refs"):
+                    return translator.refs(
+                        item, self.__audio_formats, files=self.__files
+                    )
+        views = self.__views(identifier)
+        if self.__browse_prefetch:
+            for future in self.__prefetch(views):
+                future.add_done_callback(_log_error("Error prefetching: %s"))
+        return views
 
     def __browse_root(self):
-        if not self.__directories:
-            result = self.backend.client.search(
-                "mediatype:collection AND identifier:(%s)"
-                % (" OR ".join(self.__collections)),
-                fields=["identifier", "mediatype", "title"],
+        with self.__lock:
+            if not self.__directories:
+                self.__directories.update(self.__root())
+            return list(self.__directories.values())
+
+    def __clear(self):
+        client = self.backend.client
+        if client.cache:
+            client.cache.clear()
+        if client.search_cache:
+            client.search_cache.clear()
+        if client.negative_cache:
+            client.negative_cache.clear()
+        with self.__lock:
+            self.__directories.clear()
+        if self.__derived is not None:
+            self.__derived.clear()
+        self.__lookup = {}
+
+    def __expand(self, docs):
+        identifiers = [doc["identifier"] for doc in docs]
+        items = self.__getitems(
+            identifiers, self.__search_tracks_timeout, "tracks"
+        )
+        tracks = []
+        for identifier, item in items.items():
+            try:
+                tracks.extend(self.__tracks(item))
+            except Exception as e:
+                logger.warning("Error expanding %s: %s", identifier, e)
+        return tracks
+
+    def __fanout(self, query, uris):
+        client = self.backend.client
+        futures = [
+            self.backend.executor.submit(
+                client.search,
+                "%s AND %s"
+                % (translator.query(query, [uri]), self.__search_filter),
+                fields=["identifier", "title", "creator", "date", "downloads"],
+                rows=self.__search_limit,
+                sort=self.__search_order,
             )
-            objs = {obj["identifier"]: obj for obj in result}
-            for identifier in self.__collections:
-                try:
-                    obj = objs[identifier]
-                except KeyError as e:
-                    logger.warning("Collection not found: %s", e)
-                else:
-                    self.__directories[identifier] = translator.ref(obj)
-        return list(self.__directories.values())
+            for uri in uris
+        ]
+        done, _ = concurrent.futures.wait(
+            futures, timeout=self.__search_fanout_timeout
+        )
+        results = []
+        for uri, future in zip(uris, futures):
+            if future not in done:
+                logger.debug("Not searching %s: timed out", uri)
+                continue
+            try:
+                results.append(list(future.result()))
+            except Exception as e:
+                logger.warning("Error searching %s: %s", uri, e)
+        return _merge(results, self.__search_limit)
+
+    def __prefetch(self, refs):
+        # browse results are cached by the client
+        submit = self.backend.executor.submit
+        return [submit(self.browse, ref.uri) for ref in refs]
+
+    def __refresh(self, uri):
+        # retrieve entries again and replace them only when retrieved
+        identifier, _, query = translator.parse_uri(uri)
+        if identifier and "sort" in query:
+            self.__browse_collection(identifier, query["sort"], refresh=True)
+            return
+        elif identifier and query:
+            self.__browse_collection(identifier, refresh=True)
+            return
+        elif query:
+            logger.debug("Not refreshing search %s", uri)
+            return
+        elif identifier:
+            item = self.backend.client.getitem(identifier, refresh=True)
+            if item["metadata"]["mediatype"] != "collection":
+                tracks = self.__tracks(item)
+                self.__lookup = {t.uri: t for t in tracks}
+                return
+            identifiers = [identifier]
+        else:
+            directories = self.__root(refresh=True)
+            with self.__lock:
+                self.__directories = directories
+            identifiers = list(directories)
+        for identifier in identifiers:
+            for order in self.__browse_views:
+                self.__browse_collection(identifier, [order], refresh=True)
+
+    def __root(self, refresh=False):
+        result = self.backend.client.search(
+            "mediatype:collection AND identifier:(%s)"
+            % (" OR ".join(self.__collections)),
+            fields=["identifier", "mediatype", "title"],
+            refresh=refresh,
+        )
+        objs = {obj["identifier"]: obj for obj in result}
+        directories = collections.OrderedDict()
+        for identifier in self.__collections:
+            try:
+                obj = objs[identifier]
+            except KeyError as e:
+                logger.warning("Collection not found: %s", e)
+            else:
+                directories[identifier] = translator.ref(obj)
+        return directories
+
+    def __derive(self, item):
+        # derived data is kept as long as the item is not updated; the
+        # item itself is not, since it may be cached compressed
+        identifier = item["metadata"]["identifier"]
+        version = item.get("item_last_updated", item.get("created"))
+        derived = self.__derived if version is not None else None
+        data = derived.get(identifier) if derived is not None else None
+        if data is None or data["version"] != version:
+            data = {"version": version}
+            if derived is not None:
+                derived[identifier] = data
+        return data
+
+    def __files(self, item, formats):
+        data = self.__derive(item)
+        key = ("files", tuple(formats))
+        try:
+            return data[key]
+        except KeyError:
+            pass
+        files = data[key] = translator.files(item, formats)
+        return files
+
+    def __getitems(self, identifiers, timeout, name):
+        client = self.backend.client
+        if hasattr(client, "getitems"):
+            futures = client.getitems(identifiers)  # without worker threads
+        else:
+            futures = [
+                self.backend.executor.submit(client.getitem, identifier)
+                for identifier in identifiers
+            ]
+        # items not retrieved in time will still end up in the cache
+        done, _ = concurrent.futures.wait(futures, timeout=timeout)
+        items = {}
+        for identifier, future in zip(identifiers, futures):
+            if future not in done:
+                logger.debug("Not retrieving %s for %s", name, identifier)
+                if self.backend.metrics:
+                    self.backend.metrics.count(f"library.{name}.timeout")
+            elif future.exception() is not None:
+                logger.warning(
+                    "Error retrieving %s for %s: %s",
+                    name,
+                    identifier,
+                    future.exception(),
+                )
+            else:
+                items[identifier] = future.result()
+        return items
 
     def __images(self, item):
         uri = self.backend.client.geturl  # get download URL for images
-        return translator.images(item, self.__image_formats, uri)
+        with self.__timer("translator.images"):
+            return translator.images(
+                item, self.__image_formats, uri, self.__files
+            )
+
+    def __timer(self, name):
+        metrics = self.backend.metrics
+        return metrics.timer(name) if metrics else contextlib.nullcontext()
 
     def __tracks(self, item, key=lambda t: (t.track_no or 0, t.uri)):
-        tracks = translator.tracks(item, self.__audio_formats)
-        tracks.sort(key=key)
+        data = self.__derive(item)
+        try:
+            return data["tracks"]
+        except KeyError:
+            pass
+        with self.__timer("translator.tracks"):
+            tracks = translator.tracks(
+                item, self.__audio_formats, files=self.__files
+            )
+        with tracing.span("library.sort", count=len(tracks)):
+            tracks.sort(key=key)
+        data["tracks"] = tracks
         return tracks
 
     def __views(self, identifier):
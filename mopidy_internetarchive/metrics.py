@@ -0,0 +1,100 @@
+import bisect
+import collections
+import threading
+import time
+
+# latency histogram bucket upper bounds in seconds
+BUCKETS = (
+    0.001,
+    0.002,
+    0.005,
+    0.01,
+    0.02,
+    0.05,
+    0.1,
+    0.2,
+    0.5,
+    1.0,
+    2.0,
+    5.0,
+    10.0,
+    float("inf"),
+)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p):
+        # upper bound of the bucket containing the percentile
+        rank = self.count * p / 100.0
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def stats(self):
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class _Timer:
+    def __init__(self, metrics, name):
+        self.__metrics = metrics
+        self.__name = name
+
+    def __enter__(self):
+        self.__start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.__metrics.observe(self.__name, time.perf_counter() - self.__start)
+
+
+class Metrics:
+    """Thread-safe counters and latency histograms."""
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__counters = collections.Counter()
+        self.__histograms = collections.defaultdict(Histogram)
+
+    def count(self, name, value=1):
+        with self.__lock:
+            self.__counters[name] += value
+
+    def observe(self, name, value):
+        with self.__lock:
+            self.__histograms[name].observe(value)
+
+    def timer(self, name):
+        return _Timer(self, name)
+
+    def stats(self):
+        with self.__lock:
+            return {
+                "counters": dict(sorted(self.__counters.items())),
+                "histograms": {
+                    name: self.__histograms[name].stats()
+                    for name in sorted(self.__histograms)
+                },
+            }
@@ -0,0 +1,83 @@
+import gzip
+import json
+import logging
+import os
+import time
+
+from mopidy import models
+
+from .client import InternetArchiveClient
+
+logger = logging.getLogger(__name__)
+
+VERSION = 1
+
+
+def _tuple(obj):
+    # JSON arrays back to (hashable) tuples for cache keys
+    if isinstance(obj, list):
+        return tuple(map(_tuple, obj))
+    else:
+        return obj
+
+
+def _searchresult(obj):
+    return InternetArchiveClient.SearchResult(
+        {
+            "response": {"docs": obj["docs"], "numFound": obj["rowcount"]},
+            "responseHeader": {"params": {"query": obj["query"]}},
+        }
+    )
+
+
+def _entries(cache):
+    return cache.dump() if cache is not None else []
+
+
+def _load(cache, entries, elapsed, key=None, value=None):
+    if cache is None:
+        return
+    cache.load(
+        (
+            key(k) if key else k,
+            value(v) if value else v,
+            ttl - elapsed if ttl is not None else None,
+        )
+        for k, v, ttl in entries
+    )
+
+
+def save(path, client, library):
+    """Save the client caches and library state to a file."""
+    data = {
+        "version": VERSION,
+        "time": time.time(),
+        "items": _entries(client.cache),
+        "searches": [
+            (key, vars(value), ttl)
+            for key, value, ttl in _entries(client.search_cache)
+        ],
+        "library": library.dump(),
+    }
+    tmp = path.with_name(path.name + ".tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump(data, f, cls=models.ModelJSONEncoder, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def restore(path, client, library):
+    """Restore the client caches and library state from a file."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        data = json.load(f, object_hook=models.model_json_decoder)
+    if data.get("version") != VERSION:
+        raise ValueError("Unsupported snapshot version")
+    elapsed = max(time.time() - data["time"], 0)
+    _load(client.cache, data["items"], elapsed)
+    _load(
+        client.search_cache,
+        data["searches"],
+        elapsed,
+        key=_tuple,
+        value=_searchresult,
+    )
+    library.load(data["library"])
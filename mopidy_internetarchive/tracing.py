@@ -0,0 +1,169 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("span", default=None)
+
+_tracer = None
+
+
+def _id(size):
+    return os.urandom(size).hex()
+
+
+class Span:
+    def __init__(self, tracer, name, attributes, start=None):
+        parent = _current.get()
+        if parent is None:
+            self.trace_id = _id(8)
+            self.parent_id = None
+        else:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+        self.span_id = _id(4)
+        self.name = name
+        self.attributes = attributes
+        self.start = time.time() if start is None else start
+        self.__tracer = tracer
+        self.__token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.__token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.time()
+        _current.reset(self.__token)
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration": end - self.start,
+            "thread": threading.current_thread().name,
+        }
+        if self.attributes:
+            record["attributes"] = self.attributes
+        if exc_type is not None:
+            record["error"] = f"{exc_type.__name__}: {exc_value}"
+        self.__tracer.export(record)
+
+
+class _NullSpan:
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Exports finished spans to a local file in JSON Lines format."""
+
+    def __init__(self, path):
+        self.__file = open(path, "a", buffering=1, encoding="utf-8")
+        self.__lock = threading.Lock()
+
+    def export(self, record):
+        line = json.dumps(record, default=str)
+        with self.__lock:
+            if not self.__file.closed:
+                self.__file.write(line + "\n")
+
+    def close(self):
+        with self.__lock:
+            self.__file.close()
+
+
+def configure(path=None):
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+    _tracer = Tracer(path) if path else None
+    if path:
+        logger.info("Writing Internet Archive traces to %s", path)
+
+
+def disable():
+    """Disable tracing without closing the trace file.
+
+    This is meant for forked processes, where the tracer and its lock
+    belong to the parent process.
+
+    """
+    global _tracer
+    _tracer = None
+
+
+def span(name, start=None, **attributes):
+    """Return a context manager recording a span if tracing is enabled.
+
+    Spans entered while another span is active in the same context
+    become its children.
+
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NULL_SPAN
+    else:
+        return Span(tracer, name, attributes, start)
+
+
+if __name__ == "__main__":
+    import argparse
+    import collections
+
+    parser = argparse.ArgumentParser(description="Show slowest traces")
+    parser.add_argument("path", metavar="FILE")
+    parser.add_argument("-n", "--count", type=int, default=10)
+    args = parser.parse_args()
+
+    traces = collections.defaultdict(list)
+    with open(args.path) as f:
+        for line in f:
+            record = json.loads(line)
+            traces[record["trace_id"]].append(record)
+
+    def show(record, children, indent=0):
+        print(
+            "%8.1fms %s%s %s%s"
+            % (
+                record["duration"] * 1000,
+                "  " * indent,
+                record["name"],
+                json.dumps(record.get("attributes", {})),
+                " [%s]" % record["error"] if "error" in record else "",
+            )
+        )
+        for child in sorted(
+            children[record["span_id"]], key=lambda r: r["start"]
+        ):
+            show(child, children, indent + 1)
+
+    roots = []
+    for records in traces.values():
+        children = collections.defaultdict(list)
+        for record in records:
+            if record["parent_id"] is None:
+                roots.append((record, children))
+            else:
+                children[record["parent_id"]].append(record)
+    roots.sort(key=lambda root: root[0]["duration"], reverse=True)
+    for record, children in roots[: args.count]:
+        show(record, children)
+        print()
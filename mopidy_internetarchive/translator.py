@@ -1,12 +1,19 @@
 import collections
+import concurrent.futures
 import datetime
+import functools
 import logging
+import operator
+import os
 import re
+import sys
+import urllib.parse
 
 import uritools
 from mopidy.models import Album, Artist, Image, Ref, Track
 
-from . import Extension
+from . import Extension, tracing
+from .client import BASE_URL, geturl
 
 DURATION_RE = re.compile(
     r"""
@@ -30,6 +37,13 @@ ISODATE_RE = re.compile(
 
 QUOTE_RE = re.compile(r'([+!(){}\[\]^"~*?:\\]|\&\&|\|\|)')
 
+# characters not percent-encoded by uritools.uricompose()
+_SAFE_PATH = uritools.SUB_DELIMS + ":@/"
+_SAFE_QUERY = uritools.SUB_DELIMS.replace("&", "") + ":@/?"
+_SAFE_FRAGMENT = uritools.SUB_DELIMS + ":@/?"
+
+_PREFIX = Extension.ext_name + ":"
+
 _QUERYMAP = {
     "any": lambda values: (" AND ".join(map(quote, values))),
     "album": lambda values: ("title:(%s)" % " ".join(map(quote, values))),
@@ -93,14 +107,61 @@ def parse_track(string, default=None):
     return default
 
 
+def _decode(string):
+    if "%" in string:
+        return urllib.parse.unquote(string, errors="strict")
+    else:
+        return string
+
+
+def _quote(safe, maxsize):
+    return functools.lru_cache(maxsize)(
+        functools.partial(urllib.parse.quote, safe=safe)
+    )
+
+
+_quote_path = _quote(_SAFE_PATH, 1024)
+_quote_query = _quote(_SAFE_QUERY, 1024)
+_quote_fragment = _quote(_SAFE_FRAGMENT, 4096)
+
+
+@functools.lru_cache(maxsize=4096)
+def _split(uri):
+    # same results as uritools.urisplit(), for our own URIs only
+    if not uri.startswith(_PREFIX) or uri.startswith("//", len(_PREFIX)):
+        parts = uritools.urisplit(uri)
+        return parts.path, parts.getfragment(), tuple(parts.getquerylist())
+    path, sep, fragment = uri[len(_PREFIX) :].partition("#")
+    path, _, query = path.partition("?")
+    querylist = []
+    for name, equals, value in (
+        qs.partition("=") for qs in query.split("&") if qs
+    ):
+        querylist.append((_decode(name), _decode(value) if equals else None))
+    return path, _decode(fragment) if sep else None, tuple(querylist)
+
+
 def parse_uri(uri):
-    parts = uritools.urisplit(uri)
-    return parts.path, parts.getfragment(), parts.getquerydict()
+    path, fragment, querylist = _split(uri)
+    querydict = collections.defaultdict(list)
+    for name, value in querylist:
+        querydict[name].append(value)
+    return path, fragment, querydict
 
 
 def uri(identifier="", filename=None, scheme=Extension.ext_name, **kwargs):
-    if filename:
+    # uritools.uricompose() does the same, only slower
+    fast = scheme == Extension.ext_name and not identifier.startswith("//")
+    if filename and fast:
+        path, fragment = _quote_path(identifier), _quote_fragment(filename)
+        return f"{scheme}:{path}#{fragment}"
+    elif filename:
         return uritools.uricompose(scheme, path=identifier, fragment=filename)
+    elif kwargs and fast and all(isinstance(v, str) for v in kwargs.values()):
+        query = "&".join(
+            f"{_quote_query(k)}={_quote_query(v)}" for k, v in kwargs.items()
+        )
+        return f"{scheme}:{_quote_path(identifier)}?{query}"
     elif kwargs:
         return uritools.uricompose(scheme, path=identifier, query=kwargs)
     else:
@@ -126,31 +187,55 @@ def ref(obj, uri=uri):
         return Ref.album(name=name(obj), uri=uri(identifier))
 
 
-def artists(obj):
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def _names(obj):
     artist = obj.get("artist", obj.get("creator"))
     if not artist:
         return None
     elif isinstance(artist, str):
-        return [Artist(name=artist)]
+        return (artist,)
     else:
-        return [Artist(name=name) for name in artist]
+        return tuple(artist)
+
+
+@functools.lru_cache(maxsize=1024)
+def _artists(names):
+    # shared by all albums and tracks with the same artists
+    return frozenset(Artist(name=_intern(name)) for name in names)
+
+
+def artists(obj):
+    names = _names(obj)
+    return [Artist(name=name) for name in names] if names else None
 
 
 def album(obj, uri=uri):
+    names = _names(obj)
     return Album(
         uri=uri(obj["identifier"]),
         name=name(obj),
-        artists=artists(obj),
+        artists=_artists(names) if names else None,
         date=parse_date(obj.get("date")),
     )
 
 
-def files(item, formats):
+def index(item):
+    """Return item files indexed by name and by format."""
     byname = {}
     byformat = collections.defaultdict(list)
     for obj in item["files"]:
         byname[obj["name"]] = obj
         byformat[obj["format"]].append(obj)
+    return byname, byformat
+
+
+def files(item, formats, index=index):
+    if callable(index):
+        index = index(item)
+    byname, byformat = index
     try:
         files = next(byformat[f] for f in formats if f in byformat)
     except StopIteration:
@@ -159,57 +244,144 @@ def files(item, formats):
         return [dict(byname.get(f.get("original"), {}), **f) for f in files]
 
 
-def images(item, formats, uri=uri):
+def images(item, formats, uri=uri, files=files):
     identifier = item["metadata"]["identifier"]
     images = []
-    for obj in files(item, formats):
-        images.append(Image(uri=uri(identifier, obj["name"])))
+    with tracing.span("translator.images", identifier=identifier):
+        for obj in files(item, formats):
+            images.append(Image(uri=uri(identifier, obj["name"])))
     return images
 
 
-def tracks(item, formats, uri=uri):
+def refs(item, formats, uri=uri, files=files):
+    """Return track references for an item, in track order.
+
+    This is much cheaper than creating tracks when only references
+    are needed, e.g. for browsing.
+
+    """
+    identifier = item["metadata"]["identifier"]
+    refs = []
+    with tracing.span("translator.refs", identifier=identifier) as span:
+        for obj in files(item, formats):
+            filename = obj.get("name")
+            track_uri = uri(identifier, filename)
+            track_no = parse_track(obj.get("track")) or 0
+            track_ref = Ref.track(
+                uri=track_uri, name=obj.get("title", filename)
+            )
+            refs.append(((track_no, track_uri), track_ref))
+        refs.sort(key=operator.itemgetter(0))
+        span.set(count=len(refs))
+    return [ref for _, ref in refs]
+
+
+def tracks(item, formats, uri=uri, files=files):
     identifier = item["metadata"]["identifier"]
     track = Track(album=album(item["metadata"]))
     tracks = []
-    for obj in files(item, formats):
-        filename = obj.get("name")
-        tracks.append(
-            track.replace(
-                uri=uri(identifier, filename),
-                name=obj.get("title", filename),
-                artists=artists(obj) or track.album.artists,
-                genre=obj.get("genre"),
-                track_no=parse_track(obj.get("track")),
-                length=parse_length(obj.get("length")),
-                bitrate=parse_bitrate(obj.get("bitrate")),
-                last_modified=parse_mtime(obj.get("mtime")),
+    with tracing.span("translator.tracks", identifier=identifier) as span:
+        for obj in files(item, formats):
+            filename = obj.get("name")
+            names = _names(obj)
+            tracks.append(
+                track.replace(
+                    uri=uri(identifier, filename),
+                    name=obj.get("title", filename),
+                    artists=_artists(names) if names else track.album.artists,
+                    genre=_intern(obj.get("genre")),
+                    track_no=parse_track(obj.get("track")),
+                    length=parse_length(obj.get("length")),
+                    bitrate=parse_bitrate(obj.get("bitrate")),
+                    last_modified=parse_mtime(obj.get("mtime")),
+                )
             )
-        )
+        span.set(count=len(tracks))
     return tracks
 
 
-def query(query, uris=None, exact=False):
-    if exact:
-        raise ValueError("Exact queries not supported")
+def _translate(item, formats, image_formats, image_uri):
+    return (
+        album(item["metadata"]),
+        tracks(item, formats),
+        images(item, image_formats, image_uri),
+    )
+
+
+def bulk_translate(
+    items,
+    formats,
+    image_formats=(),
+    image_uri=functools.partial(geturl, BASE_URL),
+    max_workers=None,
+    chunksize=None,
+    threshold=16,
+):
+    """Return album, tracks and images for each of many items.
+
+    Items are sent to up to `max_workers` processes in chunks of
+    `chunksize` items, so `image_uri` must be picklable, e.g.
+    `functools.partial(client.geturl, base_url)`, which is the default
+    for the default `BASE_URL`.  Fewer than `threshold` items are translated in this process, since starting
+    processes and transferring items and models would take longer than
+    translating them.
+
+    """
+    items = list(items)
+    workers = max_workers or os.cpu_count() or 1
+    translate = functools.partial(
+        _translate,
+        formats=formats,
+        image_formats=image_formats,
+        image_uri=image_uri,
+    )
+    if len(items) < max(threshold, 2) or workers < 2:
+        return [translate(item) for item in items]
+    if chunksize is None:
+        chunksize = -(-len(items) // (workers * 4))
+    with concurrent.futures.ProcessPoolExecutor(
+        workers, initializer=tracing.disable
+    ) as executor:
+        return list(executor.map(translate, items, chunksize=chunksize))
+
+
+def canonical(query, uris=None):
+    """Return a normalized, hashable representation of a search query.
+
+    Fields are sorted by name, values are lowercased with whitespace
+    collapsed and duplicates removed, and collections are sorted, so
+    equivalent queries have the same representation.
+
+    """
     terms = []
-    for key, values in query.items() if query else []:
-        try:
-            term = _QUERYMAP[key](values)
-        except KeyError:
+    for key in sorted(query or []):
+        if key not in _QUERYMAP:
             raise ValueError('Keyword "%s" not supported' % key)
-        else:
-            terms.append(term)
-    collections = []
+        values = (" ".join(value.split()).lower() for value in query[key])
+        terms.append((key, tuple(collections.OrderedDict.fromkeys(values))))
+    identifiers = set()
     for uri in uris or []:
         parts = uritools.urisplit(uri)
         if parts.path:
-            collections.append(parts.path)
+            identifiers.add(parts.path)
         elif not parts.query and not parts.fragment:
             pass  # root URI?
         else:
             raise ValueError('Cannot search "%s"' % uri)
-    if collections:
-        terms.append("collection:(%s)" % " OR ".join(collections))
+    return tuple(terms), tuple(sorted(identifiers))
+
+
+def query(query, uris=None, exact=False):
+    if exact:
+        raise ValueError("Exact queries not supported")
+    return _query(*canonical(query, uris))
+
+
+@functools.lru_cache(maxsize=256)
+def _query(terms, identifiers):
+    terms = [_QUERYMAP[key](values) for key, values in terms]
+    if identifiers:
+        terms.append("collection:(%s)" % " OR ".join(identifiers))
     return " AND ".join(terms)
 
 
@@ -1,4 +1,5 @@
 import collections
+import concurrent.futures
 
 from unittest import mock
 
@@ -14,16 +15,38 @@ def config():
             "collections": ("audio", "etree", "foo"),
             "audio_formats": ("Flac", "VBR MP3"),
             "image_formats": ("JPEG", "PNG"),
+            "images_timeout": None,
             "browse_limit": None,
             "browse_views": collections.OrderedDict(
                 [("title asc", "Title"), ("creator asc", "Creator")]
             ),
+            "browse_prefetch": None,
             "search_limit": None,
             "search_order": None,
+            "search_fanout": None,
+            "search_fanout_timeout": None,
+            "search_tracks": None,
+            "search_tracks_timeout": None,
+            "refresh_background": None,
             "cache_size": None,
             "cache_ttl": None,
+            "cache_compress": None,
+            "revalidate_interval": None,
+            "revalidate_batch": 100,
+            "cache_negative_ttl": None,
             "retries": 0,
             "timeout": None,
+            "hedge_percentile": None,
+            "hedge_budget": None,
+            "asyncio": None,
+            "connections": 1,
+            "workers": 1,
+            "metrics": None,
+            "metrics_interval": None,
+            "trace_file": None,
+            "snapshot": None,
+            "warmup": None,
+            "warmup_items": None,
         },
         "proxy": {},
     }
@@ -50,6 +73,9 @@ def client_mock():
     client_mock = mock.Mock(spec=ext.client.InternetArchiveClient)
     client_mock.SearchResult = ext.client.InternetArchiveClient.SearchResult
     client_mock.cache = mock.Mock(spec=dict)
+    client_mock.search_cache = mock.Mock(spec=dict)
+    client_mock.hedge = None
+    client_mock.negative_cache = None
     client_mock.search.return_value = client_mock.SearchResult(
         {
             "responseHeader": {"params": {"q": "album"}},
@@ -74,9 +100,18 @@ def client_mock():
 
 
 @pytest.fixture
-def backend_mock(client_mock, config):
+def executor():
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.fixture
+def backend_mock(client_mock, executor, config):
     backend_mock = mock.Mock(spec=ext.backend.InternetArchiveBackend)
     backend_mock.client = client_mock
+    backend_mock.executor = executor
+    backend_mock.metrics = None
     return backend_mock
 
 
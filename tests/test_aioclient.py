@@ -0,0 +1,131 @@
+import asyncio
+import concurrent.futures
+import time
+
+import pytest
+
+from benchmarks.fakeserver import FakeArchive
+from mopidy_internetarchive import client as client_module
+from mopidy_internetarchive.cache import Cache
+from mopidy_internetarchive.metrics import Metrics
+
+aioclient = pytest.importorskip("mopidy_internetarchive.aioclient")
+
+ITEM = {
+    "files": [{"name": "track01.mp3", "format": "VBR MP3"}],
+    "metadata": {"identifier": "album", "title": "Album", "mediatype": "audio"},
+}
+
+COLLECTIONS = {
+    "audio": [
+        {"identifier": "album", "title": "Album", "downloads": 2},
+        {"identifier": "other", "title": "Other", "downloads": 1},
+    ]
+}
+
+
+@pytest.fixture
+def server():
+    with FakeArchive(items={"album": ITEM}, collections=COLLECTIONS) as server:
+        yield server
+
+
+@pytest.fixture
+def client(server):
+    client = aioclient.EventLoopClient(server.base_url)
+    yield client
+    client.close()
+
+
+def test_getitem(client):
+    assert client.getitem("album") == ITEM
+
+
+def test_getitem_unknown(client):
+    with pytest.raises(LookupError):
+        client.getitem("unknown")
+
+
+def test_getitems(client, server):
+    server.latency = 0.1
+    for n in range(8):
+        server.items["item%d" % n] = ITEM
+    identifiers = ["item%d" % n for n in range(8)] + ["unknown"]
+    client.cache = Cache(maxsize=16)
+    client.negative_cache = Cache(maxsize=16, ttl=60)
+    client.metrics = Metrics()
+    start = time.monotonic()
+    futures = client.getitems(identifiers)
+    concurrent.futures.wait(futures, timeout=1)
+    assert time.monotonic() - start < 0.5
+    assert [f.result() for f in futures[:-1]] == [ITEM] * 8
+    assert isinstance(futures[-1].exception(), LookupError)
+    assert sorted(client.cache) == identifiers[:-1]
+    assert list(client.negative_cache) == [("metadata", "unknown")]
+    # served from caches
+    futures = client.getitems(identifiers)
+    assert all(f.done() for f in futures)
+    assert server.requests["metadata"] == 9
+    counters = client.metrics.stats()["counters"]
+    assert counters["http.metadata.status.200"] == 9
+    assert counters["cache.negative.hits"] == 1
+
+
+def test_session(server, monkeypatch):
+    def session(retries, connections):
+        raise AssertionError("requests session created")
+
+    monkeypatch.setattr(client_module, "_session", session)
+    client = aioclient.EventLoopClient(server.base_url)
+    try:
+        client.proxies.update({"http": None})
+        assert client.getitem("album") == ITEM
+    finally:
+        client.close()
+
+
+def test_search(client):
+    result = client.search(
+        "collection:audio", fields=["identifier"], sort="downloads asc"
+    )
+    assert list(result) == [{"identifier": "other"}, {"identifier": "album"}]
+    assert result.query == "collection:audio"
+
+
+def test_useragent(client):
+    client.useragent = "Mopidy-InternetArchive/1.0"
+    assert client.useragent == "Mopidy-InternetArchive/1.0"
+
+
+def test_concurrent(server):
+    server.latency = 0.1
+    thread = aioclient.EventLoopThread()
+    client = aioclient.AsyncInternetArchiveClient(
+        server.base_url, connections=10
+    )
+
+    async def getitems():
+        try:
+            return await asyncio.gather(
+                *(client.getitem("album") for _ in range(10))
+            )
+        finally:
+            await client.close()
+
+    start = time.monotonic()
+    assert thread.submit(getitems()).result() == [ITEM] * 10
+    assert time.monotonic() - start < 0.5
+    assert server.requests["metadata"] == 10
+    thread.stop()
+
+
+def test_connect(client, server):
+    client.connect()
+    assert server.requests["head"] == 1
+    assert client.poolstats() is None
+
+
+def test_compression(client, server):
+    server.items["large"] = dict(ITEM, description="Lorem ipsum " * 1000)
+    assert client.getitem("large") == server.items["large"]
+    assert server.requests["bytes"] < 1000
@@ -0,0 +1,187 @@
+import json
+import threading
+
+import pytest
+
+from mopidy_internetarchive import backend
+
+ITEM = {
+    "files": [{"name": "track01.mp3", "format": "VBR MP3"}],
+    "metadata": {"identifier": "album", "title": "Album", "mediatype": "audio"},
+}
+
+
+@pytest.fixture
+def proxy(config, audio_mock, client_mock, monkeypatch):
+    monkeypatch.setattr(backend, "_client", lambda **kwargs: client_mock)
+    config["internetarchive"]["workers"] = 2
+    actor_ref = backend.InternetArchiveBackend.start(config, audio_mock)
+    yield actor_ref.proxy()
+    actor_ref.stop()
+
+
+def test_dispatch(proxy, client_mock):
+    event = threading.Event()
+
+    def getitem(identifier):
+        if identifier == "slow":
+            event.wait()
+        return ITEM
+
+    client_mock.getitem.side_effect = getitem
+    client_mock.geturl.return_value = "http://archive.org/download/album"
+    # populate lookup cache
+    uri = "internetarchive:album#track01.mp3"
+    assert len(proxy.library.lookup(uri).get(timeout=1)) == 1
+    # block one worker
+    future = proxy.library.lookup("internetarchive:slow")
+    assert proxy.playback.translate_uri(uri).get(timeout=1)
+    assert len(proxy.library.lookup(uri).get(timeout=1)) == 1
+    assert proxy.stats().get(timeout=1)["dispatcher"]["active"] == 1
+    event.set()
+    assert len(future.get(timeout=1)) == 1
+    assert proxy.stats().get(timeout=1)["dispatcher"]["active"] == 0
+
+
+def test_dispatch_cached(config, audio_mock, client_mock, monkeypatch):
+    monkeypatch.setattr(backend, "_client", lambda **kwargs: client_mock)
+    config["internetarchive"]["cache_size"] = 16
+    config["internetarchive"]["workers"] = 2
+    event = threading.Event()
+
+    def getitem(identifier):
+        if identifier.startswith("slow"):
+            event.wait()
+        return ITEM
+
+    client_mock.getitem.side_effect = getitem
+    client_mock.geturl.return_value = "http://archive.org/download/album"
+    actor_ref = backend.InternetArchiveBackend.start(config, audio_mock)
+    proxy = actor_ref.proxy()
+    try:
+        uri = "internetarchive:album#track01.mp3"
+        assert len(proxy.library.lookup(uri).get(timeout=1)) == 1
+        client_mock.cache["item"] = ITEM
+        # block all workers
+        futures = [
+            proxy.library.lookup("internetarchive:slow%d" % n) for n in range(2)
+        ]
+        assert len(proxy.library.lookup(uri).get(timeout=1)) == 1
+        assert proxy.library.browse("internetarchive:item").get(timeout=1)
+        assert proxy.stats().get(timeout=1)["dispatcher"]["active"] == 2
+        event.set()
+        for future in futures:
+            assert len(future.get(timeout=1)) == 1
+    finally:
+        event.set()
+        actor_ref.stop()
+
+
+def test_inbox(config, audio_mock, client_mock, monkeypatch):
+    # dispatching relies on Pykka >= 3.0 private and message APIs
+    monkeypatch.setattr(backend, "_client", lambda **kwargs: client_mock)
+    actor_ref = backend.InternetArchiveBackend.start(config, audio_mock)
+    try:
+        assert isinstance(actor_ref.actor_inbox, backend._Inbox)
+    finally:
+        actor_ref.stop()
+
+
+def test_dispatch_error(proxy, client_mock):
+    client_mock.getitem.side_effect = LookupError("null")
+    with pytest.raises(LookupError):
+        proxy.library.lookup("internetarchive:null").get(timeout=1)
+
+
+def test_worker_pool():
+    pool = backend.WorkerPool(max_workers=1)
+    started, event = threading.Event(), threading.Event()
+    futures = [pool.submit(lambda: started.set() or event.wait())]
+    futures += [pool.submit(event.wait) for _ in range(2)]
+    started.wait()
+    stats = pool.stats()
+    assert stats["active"] == 1
+    assert stats["queued"] == 2
+    assert stats["max_queued"] >= 2
+    event.set()
+    assert all(future.result() for future in futures)
+    pool.shutdown()
+    assert pool.stats()["completed"] == 3
+
+
+def test_tracing(config, audio_mock, client_mock, monkeypatch, tmp_path):
+    monkeypatch.setattr(backend, "_client", lambda **kwargs: client_mock)
+    config["internetarchive"]["trace_file"] = tmp_path / "trace.jsonl"
+    client_mock.getitem.return_value = ITEM
+    actor_ref = backend.InternetArchiveBackend.start(config, audio_mock)
+    try:
+        actor_ref.proxy().library.lookup("internetarchive:album").get()
+    finally:
+        actor_ref.stop()
+    records = [
+        json.loads(line)
+        for line in (tmp_path / "trace.jsonl").read_text().splitlines()
+    ]
+    root = records[-1]
+    assert root["name"] == "library.lookup"
+    assert root["attributes"]["args"] == ["internetarchive:album"]
+    assert {
+        r["name"] for r in records if r["parent_id"] == root["span_id"]
+    } == {
+        "actor.queue",
+        "translator.tracks",
+        "library.sort",
+    }
+
+
+def test_warmup(config, audio_mock, client_mock, monkeypatch):
+    monkeypatch.setattr(backend, "_client", lambda **kwargs: client_mock)
+    config["internetarchive"]["warmup"] = True
+    config["internetarchive"]["warmup_items"] = ["album"]
+    event = threading.Event()
+    client_mock.getitem.side_effect = lambda identifier: event.set() or ITEM
+    actor_ref = backend.InternetArchiveBackend.start(config, audio_mock)
+    try:
+        assert event.wait(timeout=1)
+    finally:
+        actor_ref.stop()
+    client_mock.getitem.assert_called_once_with("album")
+
+
+def test_snapshot(config, audio_mock, client_mock, monkeypatch, tmp_path):
+    monkeypatch.setattr(backend, "_client", lambda **kwargs: client_mock)
+    config["core"] = {"cache_dir": str(tmp_path)}
+    config["internetarchive"]["snapshot"] = True
+    config["internetarchive"]["cache_size"] = 16
+    config["internetarchive"]["cache_ttl"] = 60
+    client_mock.getitem.return_value = ITEM
+    client_mock.geturl.return_value = "http://archive.org/download/album"
+
+    actor_ref = backend.InternetArchiveBackend.start(config, audio_mock)
+    client_mock.cache["album"] = ITEM
+    client_mock.search_cache[("query", ("identifier",), None, None, None)] = (
+        client_mock.SearchResult({"response": {"docs": [{"identifier": "a"}]}})
+    )
+    proxy = actor_ref.proxy()
+    proxy.library.browse("internetarchive:").get(timeout=1)
+    proxy.library.lookup("internetarchive:album").get(timeout=1)
+    actor_ref.stop()
+    assert (tmp_path / "internetarchive" / "snapshot.json.gz").exists()
+
+    client_mock.reset_mock()
+    actor_ref = backend.InternetArchiveBackend.start(config, audio_mock)
+    proxy = actor_ref.proxy()
+    try:
+        # calls are not dispatched before the snapshot is restored
+        uri = "internetarchive:album#track01.mp3"
+        assert proxy.library.lookup(uri).get(timeout=1)[0].uri == uri
+        assert client_mock.cache["album"] == ITEM
+        result = client_mock.search_cache[
+            ("query", ("identifier",), None, None, None)
+        ]
+        assert list(result) == [{"identifier": "a"}]
+        assert proxy.library.browse("internetarchive:").get(timeout=1)
+    finally:
+        actor_ref.stop()
+    client_mock.search.assert_not_called()
+    client_mock.getitem.assert_not_called()
@@ -1,5 +1,9 @@
+from unittest import mock
+
 from mopidy import models
 
+from mopidy_internetarchive.library import InternetArchiveLibraryProvider
+
 COLLECTION = {
     "metadata": {
         "identifier": "directory",
@@ -106,8 +110,109 @@ def test_browse_view(library, client_mock):
     ]
 
 
+def test_browse_view_query(library, client_mock):
+    library.browse("internetarchive:audio?sort=title%20asc&refresh=1")
+    library.browse("internetarchive:audio?foo=bar")
+    assert [c.kwargs for c in client_mock.search.call_args_list] == [
+        dict(fields=mock.ANY, rows=None, sort=["title asc"], refresh=False),
+        dict(
+            fields=mock.ANY, rows=None, sort=("downloads desc",), refresh=False
+        ),
+    ]
+
+
 def test_browse_file(library, client_mock):
     results = library.browse("internetarchive:album#file.mp3")
     client_mock.getitem.assert_not_called()
     client_mock.search.assert_not_called()
     assert results == []
+
+
+def test_warmup(library, client_mock, root_collections):
+    client_mock.getitem.return_value = ITEM
+    futures = library.warmup(["album"])
+    assert [f.result() for f in futures[-1:]] == [ITEM]
+    for future in futures[:-1]:
+        future.result()
+    assert library.browse(library.root_directory.uri) == root_collections
+    # root search, two views for each of two collections
+    assert client_mock.search.call_count == 5
+    client_mock.getitem.assert_called_once_with("album")
+
+
+def test_refresh_view(library, client_mock):
+    library.refresh("internetarchive:directory?sort=title%20asc")
+    assert client_mock.search.call_count == 1
+    assert client_mock.search.call_args[1]["sort"] == ["title asc"]
+    assert client_mock.search.call_args[1]["refresh"] is True
+    assert not client_mock.cache.clear.called
+
+
+def test_refresh_view_query(library, client_mock):
+    library.refresh("internetarchive:directory?sort=title%20asc&refresh=1")
+    library.refresh("internetarchive:directory?foo=bar")
+    assert [c.kwargs for c in client_mock.search.call_args_list] == [
+        dict(fields=mock.ANY, rows=None, sort=["title asc"], refresh=True),
+        dict(
+            fields=mock.ANY, rows=None, sort=("downloads desc",), refresh=True
+        ),
+    ]
+
+
+def test_refresh_search(library, client_mock):
+    library.refresh("internetarchive:?q=foo")
+    client_mock.search.assert_not_called()
+    client_mock.getitem.assert_not_called()
+    assert not client_mock.cache.clear.called
+
+
+def test_refresh_collection(library, client_mock):
+    client_mock.getitem.return_value = COLLECTION
+    library.refresh("internetarchive:directory")
+    client_mock.getitem.assert_called_once_with("directory", refresh=True)
+    assert [c[1]["sort"] for c in client_mock.search.call_args_list] == [
+        ["title asc"],
+        ["creator asc"],
+    ]
+
+
+def test_refresh_root(library, client_mock, root_collections):
+    assert library.browse(library.root_directory.uri) == root_collections
+    client_mock.reset_mock()
+    library.refresh(library.root_directory.uri)
+    # root search, two views for each of two collections
+    assert client_mock.search.call_count == 5
+    assert all(c[1]["refresh"] for c in client_mock.search.call_args_list)
+    assert library.browse(library.root_directory.uri) == root_collections
+    assert client_mock.search.call_count == 5
+    assert not client_mock.cache.clear.called
+
+
+def test_refresh_background(config, backend_mock, client_mock):
+    config["internetarchive"]["refresh_background"] = True
+    library = InternetArchiveLibraryProvider(
+        config["internetarchive"], backend_mock
+    )
+    client_mock.getitem.return_value = ITEM
+    library.refresh("internetarchive:album")
+    backend_mock.executor.shutdown()
+    client_mock.getitem.assert_called_once_with("album", refresh=True)
+    assert library.lookup("internetarchive:album#track01.mp3")[0].name == (
+        "Track #1"
+    )
+
+
+def test_browse_prefetch(config, backend_mock, client_mock):
+    config["internetarchive"]["browse_prefetch"] = True
+    library = InternetArchiveLibraryProvider(
+        config["internetarchive"], backend_mock
+    )
+    client_mock.getitem.return_value = COLLECTION
+    assert library.browse("internetarchive:directory") == VIEWS
+    backend_mock.executor.shutdown()
+    assert sorted(
+        c[1]["sort"][0] for c in client_mock.search.call_args_list
+    ) == [
+        "creator asc",
+        "title asc",
+    ]
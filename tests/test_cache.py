@@ -0,0 +1,279 @@
+import collections
+import concurrent.futures
+import threading
+import time
+
+from unittest import mock
+
+import pytest
+
+from mopidy_internetarchive.cache import Cache, CompressedCache
+from mopidy_internetarchive.client import InternetArchiveClient
+
+THREADS = 16
+
+
+def hammer(func, count=THREADS):
+    barrier = threading.Barrier(count)
+
+    def run(n):
+        barrier.wait()
+        return func(n)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=count) as pool:
+        return list(pool.map(run, range(count)))
+
+
+def test_mapping():
+    cache = Cache(maxsize=8, stripes=2)
+    cache["a"] = 1
+    assert cache["a"] == 1
+    assert "a" in cache
+    assert len(cache) == 1
+    assert list(cache) == ["a"]
+    assert cache.get("b") is None
+    assert cache.pop("a") == 1
+    with pytest.raises(KeyError):
+        cache["a"]
+    cache["b"] = 2
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_maxsize():
+    cache = Cache(maxsize=4, stripes=1)
+    for i in range(8):
+        cache[i] = i
+    assert sorted(cache) == [4, 5, 6, 7]
+
+
+@pytest.mark.parametrize("ttl", [None, 60])
+@pytest.mark.parametrize("maxsize", [1, 4, 10, 100, 128, 1000])
+def test_maxsize_striped(maxsize, ttl):
+    cache = Cache(maxsize=maxsize, ttl=ttl)
+    for i in range(maxsize):
+        cache[str(i)] = i
+    assert len(cache) == maxsize
+    for i in range(maxsize, 2 * maxsize):
+        cache.get_or_compute(str(i), int, i)
+    assert len(cache) == maxsize
+    assert cache.stats()["evictions"] == maxsize
+    assert cache.stats()["maxsize"] == maxsize
+    if maxsize < Cache.MIN_STRIPE_SIZE:
+        # single shard, independent of string hashing
+        assert sorted(cache.values()) == list(range(maxsize, 2 * maxsize))
+
+
+def test_ttl():
+    now = [0]
+    cache = Cache(maxsize=4, ttl=10, timer=lambda: now[0])
+    cache["a"] = 1
+    now[0] = 5
+    assert cache["a"] == 1
+    now[0] = 10
+    assert "a" not in cache
+
+
+def test_get_or_compute():
+    cache = Cache(maxsize=4)
+    assert cache.get_or_compute("a", lambda x: x * 2, 21) == 42
+    assert cache.get_or_compute("a", lambda x: x * 3, 21) == 42
+
+
+def test_get_or_compute_error():
+    cache = Cache(maxsize=4)
+    with pytest.raises(LookupError):
+        cache.get_or_compute("a", dict().__getitem__, "a")
+    assert "a" not in cache
+    assert cache.get_or_compute("a", dict(a=1).__getitem__, "a") == 1
+
+
+def test_concurrent_compute_once():
+    cache = Cache(maxsize=1024)
+    calls = collections.Counter()
+    lock = threading.Lock()
+
+    def compute(key):
+        with lock:
+            calls[key] += 1
+        time.sleep(0.001)  # give other threads a chance to pile up
+        return key * 2
+
+    def run(n):
+        return [cache.get_or_compute(k, compute, k) for k in range(n % 4, 64)]
+
+    results = hammer(run)
+    for n, values in enumerate(results):
+        assert values == [k * 2 for k in range(n % 4, 64)]
+    assert all(count == 1 for count in calls.values())
+    assert sorted(calls) == list(range(64))
+
+
+def test_concurrent_error():
+    cache = Cache(maxsize=16)
+    started = threading.Event()
+
+    def compute():
+        started.set()
+        raise LookupError("error")
+
+    def run(n):
+        try:
+            cache.get_or_compute("a", compute)
+        except LookupError:
+            return True
+
+    assert all(hammer(run))
+    assert started.is_set()
+    assert "a" not in cache
+
+
+def test_concurrent_mutations():
+    cache = Cache(maxsize=64, ttl=60)
+
+    def run(n):
+        for i in range(2000):
+            key = (n * 7 + i) % 100
+            if i % 5 == 0:
+                cache.pop(key, None)
+            elif i % 97 == 0:
+                cache.clear()
+            elif i % 3 == 0:
+                cache[key] = i
+            else:
+                cache.get(key)
+            if i % 50 == 0:
+                assert len(list(cache)) <= 64
+        return True
+
+    assert all(hammer(run))
+    assert len(cache) <= 64
+
+
+def test_client_getitem():
+    client = InternetArchiveClient()
+    client.cache = Cache(maxsize=16)
+    response = mock.Mock()
+    response.content = b'{"metadata": {"identifier": "album"}}'
+
+    def get(path, params=None):
+        time.sleep(0.01)
+        return response
+
+    with mock.patch.object(client, "_get", side_effect=get) as get_mock:
+        results = hammer(lambda n: client.getitem("album"))
+    assert get_mock.call_count == 1
+    assert all(result == results[0] for result in results)
+
+
+def test_dump_load():
+    now = [0]
+    cache = Cache(maxsize=16, ttl=10, timer=lambda: now[0])
+    cache["a"] = 1
+    now[0] = 5
+    cache["b"] = 2
+    assert sorted(cache.dump()) == [("a", 1, 5), ("b", 2, 10)]
+
+    restored = Cache(maxsize=16, ttl=10, timer=lambda: now[0])
+    restored.load([("a", 1, 5), ("b", 2, 10), ("c", 3, 0), ("d", 4, 20)])
+    assert sorted(restored.keys()) == ["a", "b", "d"]
+    now[0] = 12
+    assert sorted(restored.keys()) == ["b", "d"]
+    now[0] = 16
+    assert sorted(restored.keys()) == []
+
+
+def test_dump_load_lru():
+    cache = Cache(maxsize=16)
+    cache["a"] = 1
+    assert cache.dump() == [("a", 1, None)]
+    cache.load([("b", 2, 5)])
+    assert sorted(cache.dump()) == [("a", 1, None), ("b", 2, None)]
+
+
+def test_client_search():
+    client = InternetArchiveClient()
+    client.search_cache = Cache(maxsize=16)
+    response = mock.Mock()
+    response.content = b'{"response": {"docs": [{"identifier": "a"}]}}'
+
+    with mock.patch.object(client, "_get", return_value=response) as get_mock:
+        a = client.search("album", fields=["identifier"], sort=["date asc"])
+        b = client.search("album", fields=("identifier",), sort=("date asc",))
+        c = client.search("album", fields=["identifier"], sort=["date desc"])
+    assert get_mock.call_count == 2
+    assert a is b
+    assert list(a) == list(c) == [{"identifier": "a"}]
+
+
+def test_stats():
+    cache = Cache(maxsize=2, stripes=1)
+    cache.get_or_compute("a", str, "a")
+    cache.get_or_compute("a", str, "a")
+    cache.get_or_compute("b", str, "b")
+    cache.get_or_compute("c", str, "c")
+    assert cache.stats() == {
+        "hits": 1,
+        "misses": 3,
+        "evictions": 1,
+        "size": 2,
+        "maxsize": 2,
+    }
+
+
+def compressed(maxsize=16, ttl=None, hot=2):
+    return CompressedCache(
+        maxsize, ttl, hot, encode=lambda s: s.encode(), decode=bytes.decode
+    )
+
+
+def test_compressed():
+    cache = compressed()
+    cache["a"] = "foo" * 100
+    assert cache["a"] == "foo" * 100
+    assert cache.get("b") is None
+    assert sorted(cache.dump()) == [("a", "foo" * 100, None)]
+    assert cache.pop("a") == "foo" * 100
+    assert cache.pop("a", None) is None
+    cache.load([("b", "bar", None)])
+    assert cache["b"] == "bar"
+
+
+def test_compressed_get_or_compute():
+    cache = compressed()
+    func = mock.Mock(side_effect=str)
+    for n in range(3):
+        for key in ("a", "b", "c"):
+            assert cache.get_or_compute(key, func, key) == key
+    assert func.call_count == 3
+    stats = cache.stats()
+    assert stats["misses"] == 3
+    assert stats["hits"] == 6
+    assert stats["hot"]["maxsize"] == 2
+    cache.clear()
+    assert cache.get_or_compute("a", func, "x") == "x"
+
+
+def test_compressed_hot_expired():
+    cache = compressed(ttl=60)
+    cache.get_or_compute("a", str, "a")
+    del cache["a"]
+    assert cache.get_or_compute("a", str, "b") == "b"
+    cache["a"] = "c"
+    assert cache.get_or_compute("a", str, "d") == "c"
+
+
+def test_expiring_touch():
+    now = [0]
+    cache = Cache(maxsize=16, ttl=10, timer=lambda: now[0])
+    cache["a"] = 1
+    now[0] = 5
+    cache["b"] = 2
+    assert cache.expiring(20) == ["a", "b"]
+    assert cache.expiring(10) == ["a"]
+    now[0] = 7
+    cache.touch("a")
+    cache.touch("c")
+    assert cache.expiring(20) == ["b", "a"]
+    assert "c" not in cache
+    assert Cache(maxsize=16).expiring(20) == []
@@ -0,0 +1,198 @@
+import concurrent.futures
+
+import pytest
+import requests
+
+from benchmarks.fakeserver import FakeArchive
+from mopidy_internetarchive.cache import Cache
+from mopidy_internetarchive.client import InternetArchiveClient, _decode
+from mopidy_internetarchive.hedging import Hedge
+from mopidy_internetarchive.metrics import Metrics
+
+ITEM = {
+    "files": [{"name": "track01.mp3", "format": "VBR MP3"}],
+    "metadata": {"identifier": "album", "title": "Album", "mediatype": "audio"},
+}
+
+
+@pytest.fixture
+def server():
+    with FakeArchive(items={"album": ITEM}, latency=0.01) as server:
+        yield server
+
+
+def test_connection_reuse(server):
+    client = InternetArchiveClient(server.base_url, connections=2)
+    try:
+        for _ in range(5):
+            assert client.getitem("album") == ITEM
+        assert client.poolstats() == {
+            "pools": 1,
+            "connections": 1,
+            "requests": 5,
+        }
+    finally:
+        client.close()
+    assert server.requests["connections"] == 1
+
+
+def test_connection_limit(server):
+    client = InternetArchiveClient(server.base_url, connections=2)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(client.getitem, ["album"] * 16))
+        assert results == [ITEM] * 16
+        assert client.poolstats()["connections"] <= 2
+    finally:
+        client.close()
+    assert server.requests["connections"] <= 2
+
+
+def test_connect(server):
+    client = InternetArchiveClient(server.base_url)
+    client.metrics = Metrics()
+    try:
+        client.connect()
+        client.getitem("album")
+    finally:
+        client.close()
+    assert server.requests["head"] == 1
+    assert server.requests["connections"] == 1
+    assert client.metrics.stats()["counters"]["http.connect.status.200"] == 1
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_compression(compress):
+    items = {"album": dict(ITEM, description="Lorem ipsum " * 1000)}
+    with FakeArchive(items=items, compress=compress) as server:
+        client = InternetArchiveClient(server.base_url)
+        client.metrics = Metrics()
+        try:
+            assert client.getitem("album") == items["album"]
+        finally:
+            client.close()
+    size = client.metrics.stats()["counters"]["http.metadata.bytes"]
+    assert size == server.requests["bytes"]
+    assert (size < 1000) == compress
+
+
+def test_decode():
+    assert _decode(b'{"a": [1, "b"]}') == {"a": [1, "b"]}
+    assert _decode(b'{"a": 18446744073709551616}') == {"a": 2**64}
+    with pytest.raises(ValueError):
+        _decode(b"{")
+
+
+def test_hedge(server):
+    client = InternetArchiveClient(server.base_url)
+    client.hedge = Hedge(percentile=50, budget=1)
+    try:
+        client.search("album")
+        assert client.getitem("album") == ITEM
+        assert client.hedge.stats()["requests"] == 1
+    finally:
+        client.hedge.shutdown()
+        client.close()
+    assert server.requests["search"] == 1
+    assert server.requests["metadata"] == 1
+
+
+def test_negative_cache(server):
+    client = InternetArchiveClient(server.base_url)
+    client.cache = Cache(maxsize=16)
+    client.negative_cache = Cache(maxsize=16, ttl=60)
+    client.metrics = Metrics()
+    try:
+        for _ in range(3):
+            with pytest.raises(LookupError):
+                client.getitem("unknown")
+        assert client.getitem("album") == ITEM
+    finally:
+        client.close()
+    assert server.requests["metadata"] == 2
+    counters = client.metrics.stats()["counters"]
+    assert counters["cache.negative.stores"] == 1
+    assert counters["cache.negative.hits"] == 2
+    assert list(client.negative_cache) == [("metadata", "unknown")]
+
+
+def test_refresh(server):
+    client = InternetArchiveClient(server.base_url)
+    client.cache = Cache(maxsize=16)
+    client.negative_cache = Cache(maxsize=16, ttl=60)
+    try:
+        with pytest.raises(LookupError):
+            client.getitem("other")
+        server.items["other"] = ITEM
+        with pytest.raises(LookupError):
+            client.getitem("other")
+        assert client.getitem("other", refresh=True) == ITEM
+        assert client.getitem("other") == ITEM
+        assert client.getitem("album") == ITEM
+        server.items["album"] = dict(ITEM, files=[])
+        assert client.getitem("album") == ITEM
+        assert client.getitem("album", refresh=True)["files"] == []
+        assert client.getitem("album")["files"] == []
+    finally:
+        client.close()
+    assert server.requests["metadata"] == 4
+
+
+def test_revalidate(server):
+    items = {
+        name: dict(ITEM, metadata=dict(ITEM["metadata"], indexdate="1"))
+        for name in ("a", "b", "c")
+    }
+    server.items.update(items)
+    client = InternetArchiveClient(server.base_url)
+    client.cache = Cache(maxsize=16, ttl=60)
+    try:
+        for name in items:
+            client.getitem(name)
+        # changed after retrieval, before revalidation
+        server.items["a"] = dict(items["a"], metadata={"indexdate": "2"})
+        assert client.revalidate(["a", "b", "c"]) == ["a"]
+        assert client.getitem("a")["metadata"] == {"indexdate": "2"}
+        assert client.revalidate(["a", "b", "c"]) == []
+        server.items["b"] = dict(items["b"], metadata={"indexdate": "2"})
+        del server.items["c"]
+        assert client.revalidate(["a", "b", "c"]) == ["b"]
+        assert client.getitem("b")["metadata"] == {"indexdate": "2"}
+        assert sorted(client.cache) == ["a", "b"]
+    finally:
+        client.close()
+    assert server.requests["search"] == 3
+    assert server.requests["metadata"] == 5
+
+
+def test_revalidate_error(server, monkeypatch):
+    items = {
+        name: dict(ITEM, metadata=dict(ITEM["metadata"], indexdate="1"))
+        for name in ("a", "b")
+    }
+    server.items.update(items)
+    client = InternetArchiveClient(server.base_url)
+    client.cache = Cache(maxsize=16, ttl=60)
+    get = client._get
+
+    def fail(path, params=None):
+        if path.startswith("/metadata/a"):
+            raise requests.ConnectionError(path)
+        return get(path, params)
+
+    try:
+        for name in items:
+            client.getitem(name)
+        for name in items:
+            server.items[name] = dict(items[name], metadata={"indexdate": "2"})
+        monkeypatch.setattr(client, "_get", fail)
+        # assert other items are still retrieved
+        assert client.revalidate(["a", "b"]) == ["b"]
+        assert client.getitem("a")["metadata"]["indexdate"] == "1"
+        # assert failed items are retrieved again next time
+        monkeypatch.setattr(client, "_get", get)
+        assert client.revalidate(["a", "b"]) == ["a"]
+        assert client.getitem("a")["metadata"] == {"indexdate": "2"}
+        assert client.revalidate(["a", "b"]) == []
+    finally:
+        client.close()
@@ -17,20 +17,42 @@ def test_get_config_schema():
 
     schema = ext.get_config_schema()
 
+    assert "asyncio" in schema
     assert "audio_formats" in schema
     assert "base_url" in schema
     assert "browse_limit" in schema
     assert "browse_order" in schema
+    assert "browse_prefetch" in schema
     assert "cache_size" in schema
+    assert "cache_compress" in schema
+    assert "cache_negative_ttl" in schema
     assert "cache_ttl" in schema
     assert "collections" in schema
+    assert "connections" in schema
     assert "exclude_collections" in schema
     assert "exclude_mediatypes" in schema
+    assert "hedge_budget" in schema
+    assert "hedge_percentile" in schema
     assert "image_formats" in schema
+    assert "images_timeout" in schema
+    assert "metrics" in schema
+    assert "metrics_interval" in schema
+    assert "refresh_background" in schema
     assert "retries" in schema
+    assert "revalidate_batch" in schema
+    assert "revalidate_interval" in schema
     assert "search_limit" in schema
+    assert "search_fanout" in schema
+    assert "search_fanout_timeout" in schema
     assert "search_order" in schema
+    assert "search_tracks" in schema
+    assert "search_tracks_timeout" in schema
+    assert "snapshot" in schema
     assert "timeout" in schema
+    assert "trace_file" in schema
+    assert "warmup" in schema
+    assert "warmup_items" in schema
+    assert "workers" in schema
 
 
 def test_setup():
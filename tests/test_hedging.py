@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+from mopidy_internetarchive.hedging import Hedge
+
+
+@pytest.fixture
+def hedge():
+    hedge = Hedge(percentile=50, budget=0.5, samples=4)
+    yield hedge
+    hedge.shutdown()
+
+
+def test_no_delay(hedge):
+    assert hedge.delay() is None
+    assert hedge(str, 1) == "1"
+    assert hedge.stats()["hedged"] == 0
+
+
+def test_delay(hedge):
+    for n in range(4):
+        hedge(lambda: None)
+    assert hedge.delay() is not None
+    assert hedge.stats() == {
+        "delay": hedge.delay(),
+        "requests": 4,
+        "hedged": 0,
+        "wins": 0,
+    }
+
+
+def test_hedge(hedge):
+    for n in range(4):
+        hedge(lambda: None)
+    event = threading.Event()
+    calls = []
+
+    def request(name):
+        calls.append(name)
+        if len(calls) == 1:
+            event.wait(timeout=5)  # first request stalls
+            return "slow"
+        return "fast"
+
+    assert hedge(request, "a") == "fast"
+    event.set()
+    assert calls == ["a", "a"]
+    stats = hedge.stats()
+    assert stats["hedged"] == 1
+    assert stats["wins"] == 1
+
+
+def test_budget(hedge):
+    for n in range(4):
+        hedge(lambda: None)
+    hedge.budget = 0
+    event = threading.Event()
+    timer = threading.Timer(0.05, event.set)
+    timer.start()
+    assert hedge(event.wait, 1) is True
+    assert hedge.stats()["hedged"] == 0
+
+
+def test_error(hedge):
+    for n in range(4):
+        hedge(lambda: None)
+    event = threading.Event()
+    calls = []
+
+    def request():
+        calls.append(None)
+        if len(calls) == 1:
+            event.wait(timeout=5)
+            return "slow"
+        event.set()
+        raise ValueError("error")
+
+    # backup request failing does not fail the request
+    assert hedge(request) == "slow"
+    assert hedge.stats()["wins"] == 0
+
+
+def test_error_both(hedge):
+    for n in range(4):
+        hedge(lambda: None)
+
+    def request():
+        raise ValueError("error")
+
+    with pytest.raises(ValueError):
+        hedge(request)
@@ -1,5 +1,10 @@
+import concurrent.futures
+import threading
+
 from mopidy import models
 
+from mopidy_internetarchive.library import InternetArchiveLibraryProvider
+
 URL = "http://archive.org/download/album/cover.jpg"
 
 ITEM = {
@@ -52,3 +57,41 @@ def test_track_images(library, client_mock):
         "internetarchive:album#track01.jpg": IMAGES,
         "internetarchive:album#track02.jpg": IMAGES,
     }
+
+
+def test_batch_images(library, client_mock):
+    future = concurrent.futures.Future()
+    future.set_result(ITEM)
+    client_mock.getitems = lambda identifiers: [future] * len(identifiers)
+    client_mock.geturl.return_value = URL
+    results = library.get_images(["internetarchive:album"])
+    client_mock.getitem.assert_not_called()
+    assert results == {"internetarchive:album": IMAGES}
+
+
+def test_images_timeout(config, backend_mock, client_mock):
+    config["internetarchive"]["images_timeout"] = 0.1
+    library = InternetArchiveLibraryProvider(
+        config["internetarchive"], backend_mock
+    )
+    done = threading.Event()
+
+    def getitem(identifier):
+        if identifier == "slow":
+            done.wait()  # simulate slow response
+        return ITEM
+
+    client_mock.getitem.side_effect = getitem
+    client_mock.geturl.return_value = URL
+    results = library.get_images(
+        ["internetarchive:album", "internetarchive:slow"]
+    )
+    done.set()
+    assert results == {"internetarchive:album": IMAGES}
+    backend_mock.executor.shutdown()
+    assert client_mock.getitem.call_count == 2
+
+
+def test_images_error(library, client_mock):
+    client_mock.getitem.side_effect = LookupError("album")
+    assert library.get_images(["internetarchive:album"]) == {}
@@ -1,6 +1,10 @@
+import copy
+
 from mopidy import models
 
 import pytest
+from mopidy_internetarchive.library import InternetArchiveLibraryProvider
+from mopidy_internetarchive.metrics import Metrics
 
 ITEM = {
     "files": [
@@ -80,3 +84,41 @@ def test_lookup_unknown(library, client_mock):
     with pytest.raises(LookupError):
         library.lookup("internetarchive:null")
     client_mock.getitem.assert_called_once_with("null")
+
+
+def test_lookup_refresh_item(library, client_mock):
+    client_mock.getitem.return_value = ITEM
+    library.lookup("internetarchive:album#track01.mp3")
+    library.refresh("internetarchive:album")
+    client_mock.getitem.assert_called_with("album", refresh=True)
+    assert not client_mock.cache.clear.called
+    # assert lookup cache is updated
+    client_mock.reset_mock()
+    results = library.lookup("internetarchive:album#track02.mp3")
+    client_mock.getitem.assert_not_called()
+    assert results == [TRACK2]
+
+
+def test_lookup_derived(config, backend_mock, client_mock):
+    config["internetarchive"]["cache_size"] = 4
+    library = InternetArchiveLibraryProvider(
+        config["internetarchive"], backend_mock
+    )
+    backend_mock.metrics = Metrics()
+    album = dict(ITEM, item_last_updated=1)
+    other = dict(album, metadata=dict(ITEM["metadata"], identifier="other"))
+    items = {"album": album, "other": other}
+    # return a new object every time, like a compressed cache
+    client_mock.getitem.side_effect = lambda id, **kw: copy.deepcopy(items[id])
+    assert library.lookup("internetarchive:album") == [TRACK1, TRACK2]
+    library.lookup("internetarchive:other")
+    # assert tracks are derived once per item
+    assert library.lookup("internetarchive:album") == [TRACK1, TRACK2]
+    histograms = backend_mock.metrics.stats()["histograms"]
+    assert histograms["translator.tracks"]["count"] == 2
+    # assert derived data is replaced when the item is updated
+    items["album"] = dict(album, item_last_updated=2)
+    library.lookup("internetarchive:other")
+    assert library.lookup("internetarchive:album") == [TRACK1, TRACK2]
+    histograms = backend_mock.metrics.stats()["histograms"]
+    assert histograms["translator.tracks"]["count"] == 3
@@ -0,0 +1,62 @@
+import pytest
+
+from benchmarks.fakeserver import FakeArchive
+from mopidy_internetarchive.client import InternetArchiveClient
+from mopidy_internetarchive.metrics import Histogram, Metrics
+
+ITEM = {
+    "files": [{"name": "track01.mp3", "format": "VBR MP3"}],
+    "metadata": {"identifier": "album", "title": "Album", "mediatype": "audio"},
+}
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(1, 2, 5, float("inf")))
+    for value in (0.5, 1.5, 1.5, 4, 8):
+        histogram.observe(value)
+    stats = histogram.stats()
+    assert stats["count"] == 5
+    assert stats["mean"] == pytest.approx(3.1)
+    assert stats["p50"] == 2
+    assert stats["p90"] == 8
+    assert stats["max"] == 8
+
+
+def test_metrics():
+    metrics = Metrics()
+    metrics.count("foo")
+    metrics.count("foo", 2)
+    with metrics.timer("bar"):
+        pass
+    stats = metrics.stats()
+    assert stats["counters"] == {"foo": 3}
+    assert stats["histograms"]["bar"]["count"] == 1
+
+
+def test_client_metrics():
+    with FakeArchive(items={"album": ITEM}) as server:
+        client = InternetArchiveClient(server.base_url)
+        client.metrics = Metrics()
+        client.getitem("album")
+        client.search("collection:foo")
+        with pytest.raises(LookupError):
+            client.getitem("unknown")
+        client.close()
+    stats = client.metrics.stats()
+    assert stats["counters"]["http.metadata.status.200"] == 2
+    assert stats["counters"]["http.metadata.bytes"] > 0
+    assert stats["counters"]["http.search.status.200"] == 1
+    assert stats["histograms"]["http.metadata"]["count"] == 2
+    assert stats["histograms"]["http.search"]["count"] == 1
+
+
+def test_library_metrics(library, backend_mock, client_mock):
+    backend_mock.metrics = Metrics()
+    client_mock.getitem.return_value = ITEM
+    library.browse("internetarchive:album")
+    library.lookup("internetarchive:album")
+    library.get_images(["internetarchive:album"])
+    histograms = backend_mock.metrics.stats()["histograms"]
+    assert histograms["translator.refs"]["count"] == 1
+    assert histograms["translator.tracks"]["count"] == 1
+    assert histograms["translator.images"]["count"] == 1
@@ -1,5 +1,10 @@
+import threading
+
 from mopidy import models
 
+import mopidy_internetarchive as ext
+from mopidy_internetarchive.library import InternetArchiveLibraryProvider
+
 
 def test_search_any(library, client_mock):
     client_mock.search.return_value = client_mock.SearchResult(
@@ -37,3 +42,77 @@ def test_search_unknown(library, client_mock):
     result = library.search(dict(foo=["bar"]))
     client_mock.search.assert_not_called()
     assert result is None
+
+
+def test_search_tracks(config, backend_mock, client_mock):
+    config["internetarchive"]["search_tracks"] = 2
+    config["internetarchive"]["search_tracks_timeout"] = 0.1
+    library = InternetArchiveLibraryProvider(
+        config["internetarchive"], backend_mock
+    )
+    client_mock.search.return_value = client_mock.SearchResult(
+        {
+            "response": {
+                "docs": [
+                    {"identifier": "album1", "title": "Album #1"},
+                    {"identifier": "album2", "title": "Album #2"},
+                    {"identifier": "album3", "title": "Album #3"},
+                ],
+                "numFound": 3,
+            },
+        }
+    )
+    done = threading.Event()
+
+    def getitem(identifier):
+        if identifier == "album2":
+            done.wait()  # simulate slow response
+        return {
+            "files": [{"name": "track.mp3", "format": "VBR MP3"}],
+            "metadata": {"identifier": identifier},
+        }
+
+    client_mock.getitem.side_effect = getitem
+    result = library.search(dict(any=["album"]))
+    done.set()
+    assert len(result.albums) == 3
+    assert [track.uri for track in result.tracks] == [
+        "internetarchive:album1#track.mp3"
+    ]
+    backend_mock.executor.shutdown()
+    assert client_mock.getitem.call_count == 2
+
+
+def test_search_fanout(config, backend_mock, client_mock):
+    config["internetarchive"]["search_fanout"] = True
+    config["internetarchive"]["search_limit"] = 4
+    library = InternetArchiveLibraryProvider(
+        config["internetarchive"], backend_mock
+    )
+
+    def search(query, **kwargs):
+        if "collection:(audio)" in query:
+            docs = [
+                {"identifier": "a1", "downloads": 10},
+                {"identifier": "a2", "downloads": 20},
+                {"identifier": "a3", "downloads": 30},
+            ]
+        elif "collection:(etree)" in query:
+            docs = [
+                {"identifier": "e1", "downloads": 100},
+                {"identifier": "a1", "downloads": 10},
+            ]
+        else:
+            raise client_mock.SearchError(query)
+        return client_mock.SearchResult({"response": {"docs": docs}})
+
+    client_mock.SearchError = ext.client.InternetArchiveClient.SearchError
+    client_mock.search.side_effect = search
+    result = library.search(dict(any=["album"]))
+    assert client_mock.search.call_count == 3
+    assert [album.uri for album in result.albums] == [
+        "internetarchive:e1",
+        "internetarchive:a1",
+        "internetarchive:a2",
+        "internetarchive:a3",
+    ]
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from benchmarks.fakeserver import FakeArchive
+from mopidy_internetarchive import tracing
+from mopidy_internetarchive.client import InternetArchiveClient
+
+ITEM = {
+    "files": [{"name": "track01.mp3", "format": "VBR MP3"}],
+    "metadata": {"identifier": "album", "title": "Album", "mediatype": "audio"},
+}
+
+
+@pytest.fixture
+def spans(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    tracing.configure(path)
+    yield lambda: [json.loads(line) for line in path.read_text().splitlines()]
+    tracing.configure(None)
+
+
+def test_disabled():
+    with tracing.span("foo", bar=1) as span:
+        span.set(baz=2)
+
+
+def test_disable(spans):
+    tracer = tracing._tracer
+    tracing.disable()
+    with tracing.span("foo"):
+        pass
+    tracing._tracer = tracer  # not closed, for closing
+    with tracing.span("bar"):
+        pass
+    assert [record["name"] for record in spans()] == ["bar"]
+
+
+def test_spans(spans):
+    with tracing.span("parent", foo="bar") as span:
+        with tracing.span("child"):
+            pass
+        span.set(baz=42)
+    with pytest.raises(ValueError):
+        with tracing.span("error"):
+            raise ValueError("error")
+    child, parent, error = spans()
+    assert child["name"] == "child"
+    assert child["parent_id"] == parent["span_id"]
+    assert child["trace_id"] == parent["trace_id"]
+    assert parent["parent_id"] is None
+    assert parent["attributes"] == {"foo": "bar", "baz": 42}
+    assert parent["duration"] >= child["duration"]
+    assert error["trace_id"] != parent["trace_id"]
+    assert error["error"] == "ValueError: error"
+
+
+def test_client_spans(spans):
+    with FakeArchive(items={"album": ITEM}) as server:
+        client = InternetArchiveClient(server.base_url)
+        with tracing.span("lookup"):
+            client.getitem("album")
+        client.close()
+    records = {record["name"]: record for record in spans()}
+    assert set(records) == {
+        "lookup",
+        "client.getitem",
+        "http.get",
+        "json.decode",
+    }
+    assert records["http.get"]["attributes"]["status"] == 200
+    assert (
+        records["http.get"]["parent_id"] == records["client.getitem"]["span_id"]
+    )
+    assert (
+        records["json.decode"]["parent_id"]
+        == records["client.getitem"]["span_id"]
+    )
+    assert (
+        records["client.getitem"]["parent_id"] == records["lookup"]["span_id"]
+    )
+
+
+def test_library_spans(spans, library, client_mock):
+    client_mock.getitem.return_value = ITEM
+    library.browse("internetarchive:album")
+    library.lookup("internetarchive:album")
+    names = [record["name"] for record in spans()]
+    assert names == ["translator.refs", "translator.tracks", "library.sort"]
@@ -1,7 +1,20 @@
+import functools
+import json
+import random
+
+import uritools
 from mopidy import models
 
 import pytest
-from mopidy_internetarchive import translator
+from mopidy_internetarchive import client, translator
+
+# characters likely to need special treatment in URIs
+ALPHABET = "aZ09-._~ !$&'()*+,;=:@/?#[]%\"<>^`{|}\u00e4\u20ac\U0001f3b5"
+
+
+def strings(rng, n=100, maxlen=8):
+    for _ in range(n):
+        yield "".join(rng.choices(ALPHABET, k=rng.randrange(maxlen)))
 
 
 def test_parse_bitrate():
@@ -100,6 +113,59 @@ def test_uri(uri=translator.uri):
     )
 
 
+@pytest.mark.parametrize("seed", range(10))
+def test_uri_compatible(seed, uri=translator.uri):
+    rng = random.Random(seed)
+    for identifier in strings(rng):
+        if identifier.startswith("//"):
+            continue  # rejected by uritools
+        filename = "".join(strings(rng, 2)) or "x"
+        query = dict(zip(strings(rng, 3), strings(rng, 3))) or {"q": ""}
+        assert uri(identifier, filename) == uritools.uricompose(
+            "internetarchive", path=identifier, fragment=filename
+        )
+        assert uri(identifier, **query) == uritools.uricompose(
+            "internetarchive", path=identifier, query=query
+        )
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_parse_uri_compatible(seed, parse_uri=translator.parse_uri):
+    rng = random.Random(seed)
+    for string in strings(rng, maxlen=16):
+        for uri in [string, "internetarchive:" + string]:
+            parts = uritools.urisplit(uri)
+            try:
+                expected = (
+                    parts.path,
+                    parts.getfragment(),
+                    parts.getquerydict(),
+                )
+            except UnicodeDecodeError:
+                with pytest.raises(UnicodeDecodeError):
+                    parse_uri(uri)
+            else:
+                assert parse_uri(uri) == expected
+
+
+def test_parse_uri(parse_uri=translator.parse_uri):
+    assert parse_uri("internetarchive:") == ("", None, {})
+    assert parse_uri("internetarchive:item") == ("item", None, {})
+    assert parse_uri("internetarchive:item#file%201.mp3") == (
+        "item",
+        "file 1.mp3",
+        {},
+    )
+    assert parse_uri("internetarchive:?q=foo%20bar&q&x=") == (
+        "",
+        None,
+        {"q": ["foo bar", None], "x": [""]},
+    )
+    # assert results are not shared
+    parse_uri("internetarchive:?q=foo")[2]["q"].append("bar")
+    assert parse_uri("internetarchive:?q=foo")[2] == {"q": ["foo"]}
+
+
 def test_ref(ref=translator.ref):
     assert models.Ref.album(name="foo", uri="internetarchive:foo") == ref(
         {"identifier": "foo", "mediatype": "audio"}
@@ -201,3 +267,142 @@ def test_query_uris(query=translator.query):
         query({"any": ["foo"]}, ["internetarchive:?foo"])
     with pytest.raises(ValueError):
         query({"any": ["foo"]}, ["internetarchive:#foo"])
+
+
+def test_canonical(canonical=translator.canonical):
+    assert canonical({"any": ["foo"]}) == ((("any", ("foo",)),), ())
+    assert canonical(
+        {"artist": ["Foo  Bar", "foo bar "], "album": ["baz"]},
+        ["internetarchive:b", "internetarchive:a", "internetarchive:b"],
+    ) == (
+        (("album", ("baz",)), ("artist", ("foo bar",))),
+        ("a", "b"),
+    )
+    with pytest.raises(ValueError):
+        canonical({"track_name": ["foo"]})
+    with pytest.raises(ValueError):
+        canonical({"any": ["foo"]}, ["internetarchive:?foo"])
+
+
+def test_query_normalized(query=translator.query):
+    assert query(
+        {"artist": ["Foo"], "any": ["bar", "BAR "]},
+        ["internetarchive:b", "internetarchive:a"],
+    ) == query(
+        {"any": [" bar"], "artist": ["foo"]},
+        ["internetarchive:a", "internetarchive:b"],
+    )
+
+
+def test_refs(refs=translator.refs):
+    item = {
+        "files": [
+            {"name": "b.mp3", "format": "VBR MP3", "track": "2/3"},
+            {"name": "c.mp3", "format": "VBR MP3", "title": "C"},
+            {"name": "a.mp3", "format": "VBR MP3", "track": "1"},
+            {"name": "a.ogg", "format": "Ogg Vorbis", "track": "1"},
+        ],
+        "metadata": {"identifier": "item", "mediatype": "audio"},
+    }
+    tracks = sorted(
+        translator.tracks(item, ["VBR MP3"]),
+        key=lambda t: (t.track_no or 0, t.uri),
+    )
+    assert refs(item, ["VBR MP3"]) == [
+        models.Ref.track(uri=t.uri, name=t.name) for t in tracks
+    ]
+    assert [ref.name for ref in refs(item, ["VBR MP3"])] == [
+        "C",
+        "a.mp3",
+        "b.mp3",
+    ]
+
+
+def test_files(files=translator.files):
+    item = {
+        "files": [
+            {"name": "a.flac", "format": "Flac", "title": "A"},
+            {"name": "a.mp3", "format": "VBR MP3", "original": "a.flac"},
+        ],
+        "metadata": {"identifier": "item", "mediatype": "audio"},
+    }
+    index = translator.index(item)
+    assert files(item, ["Ogg Vorbis", "VBR MP3"], index) == [
+        {
+            "name": "a.mp3",
+            "format": "VBR MP3",
+            "original": "a.flac",
+            "title": "A",
+        }
+    ]
+    assert files(item, ["VBR MP3"]) == files(item, ["VBR MP3"], index)
+    assert files(item, ["Ogg Vorbis"], index) == []
+
+
+def test_tracks_shared(tracks=translator.tracks):
+    item = {
+        "files": [
+            {"name": "a.mp3", "format": "VBR MP3", "genre": "Rock"},
+            {"name": "b.mp3", "format": "VBR MP3", "genre": "Rock"},
+            {"name": "c.mp3", "format": "VBR MP3", "creator": ["bar", "baz"]},
+        ],
+        "metadata": {"identifier": "item", "creator": "foo"},
+    }
+    # decode separately to not share strings
+    a, b, c = tracks(json.loads(json.dumps(item)), ["VBR MP3"])
+    x, y, z = tracks(json.loads(json.dumps(item)), ["VBR MP3"])
+    assert a.artists == {models.Artist(name="foo")}
+    assert c.artists == {models.Artist(name="bar"), models.Artist(name="baz")}
+    assert a.album is b.album is x.album
+    assert a.artists is b.artists is a.album.artists is x.artists
+    assert c.artists is z.artists
+    assert a.genre is b.genre is x.genre
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_bulk_translate(max_workers, bulk_translate=translator.bulk_translate):
+    items = [
+        {
+            "files": [
+                {"name": "a.mp3", "format": "VBR MP3", "title": "A"},
+                {"name": "b.mp3", "format": "VBR MP3", "title": "B"},
+                {"name": "a.jpg", "format": "JPEG"},
+            ],
+            "metadata": {"identifier": "item%d" % n, "creator": "foo"},
+        }
+        for n in range(5)
+    ]
+    default = client.InternetArchiveClient()
+    expected = [
+        (
+            translator.album(item["metadata"]),
+            translator.tracks(item, ["VBR MP3"]),
+            translator.images(item, ["JPEG"], default.geturl),
+        )
+        for item in items
+    ]
+    result = bulk_translate(
+        items,
+        ["VBR MP3"],
+        ["JPEG"],
+        max_workers=max_workers,
+        chunksize=2,
+        threshold=2,
+    )
+    assert expected == result
+    assert result[0][2][0].uri == "http://archive.org/download/item0/a.jpg"
+    other = client.InternetArchiveClient("https://example.com/")
+    expected = [
+        (album, tracks, translator.images(item, ["JPEG"], other.geturl))
+        for item, (album, tracks, _) in zip(items, expected)
+    ]
+    assert expected == bulk_translate(
+        items,
+        ["VBR MP3"],
+        ["JPEG"],
+        image_uri=functools.partial(client.geturl, "https://example.com/"),
+        max_workers=max_workers,
+        chunksize=2,
+        threshold=2,
+    )
+    assert bulk_translate([], ["VBR MP3"], max_workers=max_workers) == []